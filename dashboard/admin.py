@@ -0,0 +1,18 @@
+"""Access control for the admin-only pages.
+
+Admin pages are disabled unless the ``WBLCA_ADMIN_TOKEN`` environment
+variable is set; requests then have to pass the same value as the ``token``
+query parameter, e.g. ``/admin/diagnostics?token=...``.
+"""
+import hmac
+import os
+
+ADMIN_TOKEN_ENV = "WBLCA_ADMIN_TOKEN"
+
+
+def is_admin(token):
+    """True when ``token`` matches the configured admin token."""
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(str(token).encode("utf-8"), expected.encode("utf-8"))
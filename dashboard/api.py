@@ -0,0 +1,157 @@
+"""Read-only JSON/CSV API over the chart aggregations.
+
+Other tools get the numbers behind the charts from here instead of scraping
+the dashboard::
+
+    GET /api/v1/material?secondary=mat_type&metric=mui (kg/m²)&aggregation=median
+        [&primary=mat_group][&stacked_100_percent=1][&filter=site_country:Canada]...
+    GET /api/v1/building?categorical=bldg_prim_use_recat&numerical=bldg_cfa&aggregation=sum
+        [&stacking=site_country][&filter=...]...
+
+Both take ``quantile_mode=exact|approximate`` (see ``quantile_sketch``) and
+add ``format=csv`` for CSV. ``filter`` takes ``<feature>:<value>`` and may be
+repeated; values of the same feature are alternatives. Results come from the
+same memoized stages as the charts, and every response carries an ETag
+derived from the dataset version and the query plus the data files'
+Last-Modified, so repeated requests are answered with 304 Not Modified.
+"""
+import hashlib
+import json
+
+import flask
+
+from dashboard import building_chart, data_access, material_pipeline, quantile_sketch
+
+API_CACHE_SECONDS = 300
+BUILDING_AGGREGATIONS = ("sum", "mean", "median", "count")
+
+api = flask.Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _choice(args, name, options, required=True):
+    value = args.get(name) or None
+    if value is None and not required:
+        return None
+    if value not in options:
+        raise BadRequest(f"'{name}' must be one of: {', '.join(map(str, options))}")
+    return value
+
+
+def _filters(args, allowed):
+    """``filter=<feature>:<value>`` arguments as a canonical, hashable filter key."""
+    filters = {}
+    for item in args.getlist("filter"):
+        feature, separator, value = item.partition(":")
+        if not separator or feature not in allowed:
+            raise BadRequest(f"'filter' must be <feature>:<value> with a feature in: {', '.join(allowed)}")
+        filters.setdefault(feature, []).append(value)
+    # ✅ Same canonical order as the chart callbacks, so they share the cache and the ETag
+    return material_pipeline.normalize_filters(list(filters), list(filters.values()))
+
+
+def _quantile_mode(args):
+    mode = _choice(args, "quantile_mode", quantile_sketch.QUANTILE_MODES, required=False)
+    return mode or quantile_sketch.QUANTILE_MODE
+
+
+def _option_values(options):
+    return [option["value"] for option in options]
+
+
+def material_query(args):
+    categorical = _option_values(data_access.get_categorical_options())
+    query = {
+        "filters": _filters(args, _option_values(data_access.get_material_filter_options())),
+        "metric": _choice(args, "metric", data_access.MATERIAL_METRICS),
+        "secondary": _choice(args, "secondary", categorical),
+        "primary": _choice(args, "primary", categorical, required=False),
+        "aggregation": _choice(args, "aggregation", ("mean", "median")),
+        "stacked_100_percent": args.get("stacked_100_percent", "0").lower() in ("1", "true", "yes"),
+        "quantile_mode": _quantile_mode(args),
+    }
+    if query["primary"] == query["secondary"]:
+        raise BadRequest("'primary' and 'secondary' must differ")
+    return query
+
+
+def material_table(query):
+    secondary_totals, output_df = material_pipeline.normalization(
+        query["filters"], query["metric"], query["secondary"], query["primary"], query["aggregation"],
+        query["stacked_100_percent"], None, query["quantile_mode"],
+    )
+    return secondary_totals if output_df is None else output_df
+
+
+def building_query(args):
+    return {
+        "filters": _filters(args, _option_values(data_access.get_building_categorical_options())),
+        "categorical": _choice(args, "categorical", _option_values(data_access.get_building_categorical_options())),
+        "numerical": _choice(args, "numerical", _option_values(data_access.get_building_numerical_options())),
+        "aggregation": _choice(args, "aggregation", BUILDING_AGGREGATIONS),
+        "stacking": _choice(args, "stacking", _option_values(data_access.get_building_categorical_options()),
+                            required=False),
+        "quantile_mode": _quantile_mode(args),
+    }
+
+
+def building_table(query):
+    aggregated = building_chart.aggregate(
+        query["categorical"], query["numerical"], query["aggregation"], query["filters"], query["stacking"], True,
+        None, query["quantile_mode"],
+    )
+    if aggregated is None:
+        raise BadRequest("No aggregation for this selection")
+    return aggregated[0]
+
+
+def _respond(parse_query, build_table):
+    response_format = flask.request.args.get("format", "json")
+    if response_format not in ("json", "csv"):
+        return flask.jsonify(error="'format' must be json or csv"), 400
+
+    try:
+        query = parse_query(flask.request.args)
+    except BadRequest as error:
+        return flask.jsonify(error=str(error)), 400
+
+    version = data_access.get_dataset_version()
+    etag = hashlib.sha1(
+        json.dumps([version, flask.request.path, query, response_format], default=list).encode("utf-8")
+    ).hexdigest()
+    response = flask.Response(mimetype="text/csv" if response_format == "csv" else "application/json")
+    response.set_etag(etag)
+    response.last_modified = data_access.get_dataset_modified()
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_SECONDS
+    # ✅ 304 Not Modified when the client already has this version
+    response.make_conditional(flask.request)
+    if response.status_code == 304:
+        return response
+
+    try:
+        table = build_table(query)
+    except BadRequest as error:
+        return flask.jsonify(error=str(error)), 400
+
+    if response_format == "csv":
+        response.set_data(table.to_csv(index=False))
+    else:
+        response.set_data(
+            '{"dataset_version": ' + json.dumps(version) + ', "query": ' + json.dumps(query, ensure_ascii=False)
+            + ', "rows": ' + table.to_json(orient="records", force_ascii=False) + "}"
+        )
+    return response
+
+
+@api.route("/material")
+def material():
+    return _respond(material_query, material_table)
+
+
+@api.route("/building")
+def building():
+    return _respond(building_query, building_table)
@@ -0,0 +1,105 @@
+"""Background execution of the heavy callbacks.
+
+Expensive callbacks (``process_data``) run as Dash background callbacks so
+the gunicorn worker that received the request is free again immediately;
+the browser polls for progress and the result. Jobs and results live in a
+diskcache directory shared by all workers on the machine, so a poll can be
+answered by any worker; it is private to the app's user, as results are
+stored pickled.
+
+On top of Dash's ``DiskcacheManager`` this adds de-duplication: identical
+requests (same callback, same inputs, same dataset version) share one job
+while it is running, and finished results are reused until they expire.
+A job is only killed when every request waiting on it has been cancelled.
+"""
+import os
+import time
+
+import diskcache
+from dash import DiskcacheManager
+
+from dashboard import data_access, request_profiler
+
+JOB_CACHE_DIR = os.environ.get("WBLCA_JOB_CACHE_DIR", os.path.join(data_access.CACHE_ROOT, "jobs"))
+RESULT_EXPIRE_SECONDS = 60 * 60
+JOB_START_TIMEOUT_SECONDS = 2.0
+
+# Stand-in job id for results that are already on disk
+CACHED_RESULT_JOB = 0
+_STARTING = "starting"
+
+
+def _inflight_key(key):
+    return f"{key}-inflight"
+
+
+def _waiters_key(job):
+    return f"job-{job}-waiters"
+
+
+def _job_result_key(job):
+    return f"job-{job}-key"
+
+
+class DedupingDiskcacheManager(DiskcacheManager):
+    """DiskcacheManager that shares one job between identical in-flight requests."""
+
+    def call_job_fn(self, key, job_fn, args, context):
+        if self.result_ready(key):
+            return CACHED_RESULT_JOB
+
+        # ✅ ``add`` is atomic: exactly one request claims the key and starts the job
+        if not self.handle.add(_inflight_key(key), _STARTING, expire=RESULT_EXPIRE_SECONDS):
+            job = self._wait_for_job(key)
+            if job is not None:
+                self.handle.incr(_waiters_key(job), default=0)
+                return job
+
+        job = super().call_job_fn(key, job_fn, args, context)
+        self.handle.set(_waiters_key(job), 1, expire=RESULT_EXPIRE_SECONDS)
+        self.handle.set(_job_result_key(job), key, expire=RESULT_EXPIRE_SECONDS)
+        self.handle.set(_inflight_key(key), job, expire=RESULT_EXPIRE_SECONDS)
+        return job
+
+    def _wait_for_job(self, key):
+        """Job id of the running job for ``key``, or ``None`` if there is none."""
+        deadline = time.monotonic() + JOB_START_TIMEOUT_SECONDS
+        while True:
+            job = self.handle.get(_inflight_key(key))
+            if job is None:
+                return None
+            if job != _STARTING:
+                return job if self.job_running(job) or self.result_ready(key) else None
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0.05)
+
+    def terminate_job(self, job):
+        if not job or int(job) == CACHED_RESULT_JOB:
+            return
+        job = int(job)
+
+        # ✅ Only kill the process once no other request is waiting on it
+        with self.handle.transact():
+            remaining = self.handle.decr(_waiters_key(job), default=1)
+            if remaining > 0:
+                return
+            self.handle.delete(_waiters_key(job))
+            key = self.handle.pop(_job_result_key(job))
+            if key is not None and self.handle.get(_inflight_key(key)) == job:
+                self.handle.delete(_inflight_key(key))
+
+        super().terminate_job(job)
+
+    def job_running(self, job):
+        if not job or int(job) == CACHED_RESULT_JOB:
+            return False
+        return super().job_running(job)
+
+
+background_callback_manager = DedupingDiskcacheManager(
+    diskcache.Cache(data_access.private_dir(JOB_CACHE_DIR)),
+    # ✅ Results are reused across sessions until the source data changes; profiled requests run their own job
+    cache_by=[data_access.get_dataset_version, request_profiler.cache_token],
+    expire=RESULT_EXPIRE_SECONDS,
+)
@@ -0,0 +1,248 @@
+"""Bar chart of the building level analysis page.
+
+The chart only depends on its (hashable) selection, so it is built by one
+memoized function: repeated selections, and selections pre-computed by the
+cache warm-up, are served without touching the data.
+
+In approximate quantile mode (see ``quantile_sketch``) every project's
+value is bucketed once per metric, and the medians and quartiles of a
+selection come from merging the buckets of its projects per group.
+
+A ``facet`` column splits the chart into small multiples: it is prepended
+to every group key, so all subplots come out of the same grouped pass.
+"""
+import math
+from functools import lru_cache
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from dashboard import data_access, peer_ranking, quantile_sketch
+from dashboard.figure_serialization import compact_figure
+from dashboard.material_pipeline import FACET_WRAP, MAX_FACETS, memoized_stage
+
+
+@lru_cache(maxsize=None)
+def project_sketch_keys(numerical):
+    """Quantile sketch bucket key of every project's ``numerical`` value."""
+    keys = quantile_sketch.bucket_keys(data_access.get_wblca_meta_data()[numerical].to_numpy(dtype="float64"))
+    keys.flags.writeable = False
+    return keys
+
+
+def sketch_quantiles(filtered_data, by, numerical, qs):
+    """Approximate quantiles of ``numerical`` per group of ``by``, in group order."""
+    grouped = filtered_data.groupby(by)
+    positions = data_access.get_wblca_meta_data().index.get_indexer(filtered_data.index)
+    sketches = quantile_sketch.group_sketches(
+        project_sketch_keys(numerical)[positions], quantile_sketch.ngroup_codes(grouped), grouped.ngroups
+    )
+    return quantile_sketch.quantiles(sketches, qs)
+
+
+@memoized_stage("building_aggregation", shared=True)
+def aggregate(categorical, numerical, aggregation, filters, stacking, show_error_bars, facet=None,
+              quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Aggregated table behind the chart.
+
+    Returns ``(table, value_column, sorted_categories)``, or ``None`` for a
+    selection that has no chart. With a ``facet`` the table has one group
+    per facet value and category.
+    """
+    # Filter the data based on selected filters
+    filtered_data = data_access.get_wblca_meta_data()
+    if filters:
+        # ✅ Rows come from the inverted index of the categorical columns, no isin per filter
+        filtered_data = filtered_data[peer_ranking.peer_mask(filters)]
+
+    # Ensure a primary categorical variable is selected
+    if not categorical:
+        return None
+
+    # Get unique sorted categories to maintain consistent order
+    if facet:
+        # ✅ At most MAX_FACETS subplots: the facet values with the most projects
+        largest = filtered_data[facet].value_counts().index[:MAX_FACETS]
+        filtered_data = filtered_data[filtered_data[facet].isin(largest)]
+
+    sorted_categories = sorted(filtered_data[categorical].dropna().unique())
+    keys = [facet, categorical] if facet else [categorical]
+
+    if stacking:
+        # Handle stacked bar chart
+        if aggregation in ["mean", "median"]:
+            # Calculate overall aggregation per primary category
+            overall_agg = (
+                filtered_data.groupby(keys)[numerical]
+                .agg("count" if aggregation == "median" and quantile_sketch.approximate(quantile_mode) else aggregation)
+                .reset_index()
+                .rename(columns={numerical: "OverallAggregate"})
+            )
+            if aggregation == "median" and quantile_sketch.approximate(quantile_mode):
+                overall_agg["OverallAggregate"] = sketch_quantiles(filtered_data, keys, numerical, (0.5,))[:, 0]
+
+            # Calculate contributions to the overall aggregation
+            contributions = (
+                filtered_data.groupby(keys + [stacking])[numerical]
+                .sum()
+                .reset_index()
+            )
+
+            # Merge contributions with the overall aggregate
+            contributions = contributions.merge(overall_agg, on=keys)
+            contributions["Contribution"] = (
+                contributions[numerical] / contributions.groupby(keys)[numerical].transform("sum")
+            ) * contributions["OverallAggregate"]
+
+            # Set the value column for the stacked chart
+            y = "Contribution"
+        elif aggregation == "count":
+            contributions = filtered_data.groupby(keys + [stacking]).size().reset_index(name="Count")
+            y = "Count"
+        elif categorical and numerical:
+            contributions = (
+                filtered_data.groupby(keys + [stacking])[numerical]
+                .sum()
+                .reset_index()
+            )
+            y = numerical
+        else:
+            return None
+    else:
+        # Handle regular bar chart without stacking
+        if aggregation == "count":
+            grouped_data = filtered_data[keys if facet else categorical].value_counts().reset_index()
+            grouped_data.columns = keys + ["Count"]
+            y = "Count"
+        elif categorical and numerical:
+            if quantile_sketch.approximate(quantile_mode):
+                # ✅ Median and quartiles merged from the per-project sketch buckets
+                stats = filtered_data.groupby(keys)[numerical].agg(["count", "mean", "sum"])
+                median, q1, q3 = sketch_quantiles(filtered_data, keys, numerical, (0.5, 0.25, 0.75)).T
+                grouped_data = stats.index.to_frame(index=False).assign(
+                    Value=median if aggregation == "median" else stats[aggregation].to_numpy(),
+                    Count=stats["count"].to_numpy(),
+                    Q1=q1,
+                    Q3=q3,
+                )
+            else:
+                grouped_data = filtered_data.groupby(keys).agg(
+                    {numerical: [aggregation, "count", lambda x: x.quantile(0.25), lambda x: x.quantile(0.75)]}
+                ).reset_index()
+                grouped_data.columns = keys + ["Value", "Count", "Q1", "Q3"]
+
+            # Add error bars only if checkbox is checked and the aggregation method is mean or median
+            if show_error_bars and aggregation in ["mean", "median"]:
+                grouped_data["ErrorMinus"] = grouped_data["Value"] - grouped_data["Q1"]
+                grouped_data["ErrorPlus"] = grouped_data["Q3"] - grouped_data["Value"]
+            else:
+                grouped_data["ErrorMinus"] = None
+                grouped_data["ErrorPlus"] = None
+
+            y = "Value"
+        else:
+            return None
+
+    return (contributions if stacking else grouped_data), y, sorted_categories
+
+
+@memoized_stage("building_figure", shared=True)
+def figure(categorical, numerical, aggregation, width, height, orientation, filters, stacking, show_error_bars,
+           facet=None, quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Build the chart for a selection; ``filters`` comes from ``material_pipeline.normalize_filters``.
+
+    A ``facet`` other than the categorical and stacking variables draws one
+    subplot per facet value, ``FACET_WRAP`` to a row (see ``aggregate``).
+    ``quantile_mode`` picks exact or sketched medians and quartiles.
+    """
+    # ✅ If no categorical or numerical feature is selected, return an empty placeholder figure
+    if not categorical or not numerical:
+        empty_fig = go.Figure()
+        empty_fig.update_layout(
+            title="Please select features",
+            xaxis_title="",
+            yaxis_title="",
+            plot_bgcolor="white",
+            paper_bgcolor="white",
+            width=width if width else 800,
+            height=height if height else 600,
+            font={'family': 'Open Sans'},
+            xaxis=dict(showgrid=False, zeroline=False),
+            yaxis=dict(showgrid=False, zeroline=False)
+        )
+        return compact_figure(empty_fig)
+
+    if facet in (categorical, stacking):
+        facet = None
+    aggregated = aggregate(
+        categorical, numerical, aggregation, filters, stacking, show_error_bars, facet, quantile_mode
+    )
+    if aggregated is None:
+        return {}
+    table, y, sorted_categories = aggregated
+    facet_args, facet_orders = {}, {}
+    n_rows = n_cols = 1
+    if facet:
+        facet_values = sorted(table[facet].dropna().unique())
+        n_rows, n_cols = math.ceil(len(facet_values) / FACET_WRAP), min(len(facet_values), FACET_WRAP)
+        facet_args = {"facet_col": facet, "facet_col_wrap": FACET_WRAP}
+        facet_orders = {facet: facet_values}
+    x = categorical
+    color = stacking if stacking else None
+
+    # Create the y-axis label dynamically
+    if stacking:
+        y_axis_label = f"{numerical} (Contributions by '{stacking}')"
+    else:
+        y_axis_label = numerical if aggregation != "count" else "Count"
+
+    # Swap x and y for horizontal orientation
+    if orientation == "h":
+        x, y = y, x
+        x_axis_label = y_axis_label
+        y_axis_label = categorical
+        error_bar_plus = "ErrorPlus" if show_error_bars and aggregation in ["mean", "median"] else None
+        error_bar_minus = "ErrorMinus" if show_error_bars and aggregation in ["mean", "median"] else None
+        error_bar_args = {"error_x": error_bar_plus, "error_x_minus": error_bar_minus}
+    else:
+        x_axis_label = categorical
+        error_bar_plus = "ErrorPlus" if show_error_bars and aggregation in ["mean", "median"] else None
+        error_bar_minus = "ErrorMinus" if show_error_bars and aggregation in ["mean", "median"] else None
+        error_bar_args = {"error_y": error_bar_plus, "error_y_minus": error_bar_minus}
+
+    # Create the figure
+    import plotly.express as px  # ✅ Deferred: plotly.express is slow to import and only needed here
+    fig = px.bar(
+        table,
+        x=x,
+        y=y,
+        color=color,
+        barmode="stack" if stacking else "group",
+        orientation=orientation,
+        title=f"Bar Chart of {numerical if aggregation != 'count' else 'Counts'} by {categorical}"
+              + (f" (Stacked by {stacking})" if stacking else ""),
+        category_orders={categorical: sorted_categories, **facet_orders},  # Maintain consistent order
+        labels={
+            x: x_axis_label,
+            y: y_axis_label,
+        },
+        **error_bar_args,  # Dynamically add error bars
+        **facet_args,
+    )
+    if facet:
+        # ✅ Subplot titles read "value" instead of "column=value"
+        fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split("=", 1)[-1]))
+        fig.update_xaxes(showgrid=orientation == "h", gridcolor="lightgray", gridwidth=0.5)
+        fig.update_yaxes(showgrid=orientation == "v", gridcolor="lightgray", gridwidth=0.5)
+
+    fig.update_layout(
+        font=dict(family="Open Sans", size=12),
+        width=width if width else max(800, 300 * n_cols),
+        height=height if height else max(600, 350 * n_rows),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        margin=dict(l=40, r=40, t=80 if facet else 40, b=40),
+        xaxis=dict(showgrid=orientation == "h", gridcolor="lightgray", gridwidth=0.5),
+        yaxis=dict(showgrid=orientation == "v", gridcolor="lightgray", gridwidth=0.5),
+    )
+    return compact_figure(fig)
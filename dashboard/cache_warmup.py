@@ -0,0 +1,74 @@
+"""Pre-compute the most popular charts after a worker starts.
+
+A background thread replays the top selections of ``selection_log`` through
+the memoized chart builders, so the aggregation and figure caches are
+already filled when the first users arrive. It stops at the first of: all
+selections built, the time budget spent, or the worker's resident memory
+grown by more than the memory budget. Background callback jobs forked after
+the warm-up inherit the warmed caches.
+"""
+import logging
+import os
+import threading
+import time
+
+from dashboard import building_chart, material_pipeline, selection_log
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+WARMUP_TOP_N = int(os.environ.get("WBLCA_WARMUP_TOP_N", 20))
+WARMUP_SECONDS = float(os.environ.get("WBLCA_WARMUP_SECONDS", 30))
+WARMUP_MEMORY_MB = float(os.environ.get("WBLCA_WARMUP_MEMORY_MB", 256))
+
+# ✅ Builders take the recorded argument tuple as-is
+CHART_BUILDERS = {
+    "material": material_pipeline.run_stages,
+    "building": building_chart.figure,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _rss():
+    return psutil.Process(os.getpid()).memory_info().rss if psutil else 0
+
+
+def warm_up(top_n=WARMUP_TOP_N, seconds=WARMUP_SECONDS, memory_mb=WARMUP_MEMORY_MB):
+    """Build the ``top_n`` most popular charts within the budgets; return a summary."""
+    start, start_rss = time.perf_counter(), _rss()
+    built = failed = 0
+    stopped_by = None
+
+    for chart, key in selection_log.most_popular(top_n):
+        if time.perf_counter() - start > seconds:
+            stopped_by = "time"
+            break
+        if _rss() - start_rss > memory_mb * 2 ** 20:
+            stopped_by = "memory"
+            break
+        try:
+            CHART_BUILDERS[chart](*key)
+            built += 1
+        except Exception:  # noqa: BLE001 - a stale selection must not stop the warm-up
+            failed += 1
+            logger.warning("Warm-up of %s selection %r failed", chart, key, exc_info=True)
+
+    summary = {
+        "built": built,
+        "failed": failed,
+        "stopped_by": stopped_by,
+        "seconds": time.perf_counter() - start,
+        "memory_bytes": _rss() - start_rss,
+    }
+    logger.info("Cache warm-up finished: %s", summary)
+    return summary
+
+
+def start():
+    """Run ``warm_up`` in a daemon thread and return the thread."""
+    thread = threading.Thread(target=warm_up, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,71 @@
+"""Cross-filtering between the charts.
+
+Clicking a bar, or box/lasso selecting bars, in the material or building
+level chart restricts the other charts to the selected categories. The
+selections live in the session ``cross-filter`` store as
+``{chart: [column, [values]]}``, and each chart applies the selections of
+the other charts on top of its own filters.
+
+The selections are appended after the chart's own (normalized) filters, so
+the material row mask is the cached mask of the chart's own filters and'ed
+with one more column selection (see ``material_pipeline.filter_mask``),
+and the building level charts select rows from the inverted index of
+``peer_ranking`` instead of filtering the frame column by column.
+"""
+from dashboard import data_access, peer_ranking
+
+# Chart -> dataset its categories come from
+CHART_DATASETS = {"material": "material", "building": "building"}
+
+# Chart -> columns it can be filtered on
+CHART_COLUMNS = {
+    "material": lambda: data_access.get_scope_df(data_access.BASE_SCOPE).columns,
+    "breakdown": lambda: data_access.get_scope_df(data_access.BASE_SCOPE).columns,
+    "building": peer_ranking.get_inverted_index,
+}
+
+
+def category_values(chart, column, points, axis="x"):
+    """Dataset values of ``column`` under the clicked or selected ``points``.
+
+    Plotly reports category labels as displayed; they are matched back to
+    the column's values so numeric categories filter correctly.
+    """
+    labels = {str(point.get(axis)) for point in points or () if point.get(axis) is not None}
+    return [
+        value.item() if hasattr(value, "item") else value  # ✅ NumPy scalars are not JSON serializable
+        for value in data_access.get_filter_values(CHART_DATASETS[chart], column)
+        if str(value) in labels
+    ]
+
+
+def update(cross_filters, chart, column, values):
+    """Store with ``chart``'s selection set to ``column`` in ``values``.
+
+    Selecting the current selection again, or nothing, clears it.
+    """
+    cross_filters = dict(cross_filters or {})
+    selection = [column, list(values)] if column and values else None
+    if selection is None or cross_filters.get(chart) == selection:
+        cross_filters.pop(chart, None)
+    else:
+        cross_filters[chart] = selection
+    return cross_filters
+
+
+def filters_for(cross_filters, chart):
+    """Normalized filters from the other charts' selections that apply to ``chart``."""
+    columns = CHART_COLUMNS[chart]()
+    return tuple(
+        (column, tuple(values))
+        for source, (column, values) in sorted((cross_filters or {}).items())
+        if source != chart and column in columns and values
+    )
+
+
+def describe(cross_filters):
+    """One line per active selection, for the cross-filter bar of the layout."""
+    return [
+        f"{source.capitalize()} chart: {column} = {', '.join(str(value) for value in values)}"
+        for source, (column, values) in sorted((cross_filters or {}).items())
+    ]
@@ -0,0 +1,428 @@
+"""Shared data access for the app and every page module.
+
+All workbooks and CSVs are parsed here, once per process, behind lazy
+accessors. Pages and callbacks import the accessors instead of reading
+files or relying on globals defined in ``app.py``; derived columns, option
+lists and per-feature filter values are cached alongside the data. Parsed
+Excel workbooks are also pickled to ``PARSE_CACHE_DIR``, so only the first
+worker to boot on a machine pays for openpyxl.
+
+The on-disk caches of the app default to directories below ``CACHE_ROOT``,
+inside the app, and are checked with ``private_dir`` before use: they are
+loaded with pickle, so nobody but the app's user may be able to write them.
+
+Every frame handed out is frozen: its NumPy buffers are read-only, so a
+callback that tries to write into shared data fails loudly instead of
+corrupting it for the other threads of the worker.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache, wraps
+
+import numpy as np
+import pandas as pd
+
+# ✅ Define Absolute Paths for Data Files
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+
+WBLCA_RESULTS_PATH = os.path.join(DATA_DIR, "full_lca_results_02-21-2025_a1_to_a3.csv")
+WBLCA_META_DATA_PATH = os.path.join(DATA_DIR, "buildings_metadata_02-21-2025_a1_to_a3_new_construction.xlsx")
+GLOSSARY_PATH = os.path.join(ASSETS_DIR, "data_glossary.xlsx")
+
+# Parent of the on-disk cache directories: app-owned, never a shared temp dir
+CACHE_ROOT = os.environ.get("WBLCA_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+
+# Parsed workbooks are pickled here, so worker boots after the first skip openpyxl
+PARSE_CACHE_DIR = os.environ.get("WBLCA_PARSE_CACHE_DIR", os.path.join(CACHE_ROOT, "parsed"))
+
+NA_VALUES = ["NA", "NULL"]
+
+# Material results columns parsed as numbers (unparseable values become NaN)
+RESULTS_NUMERIC_COLUMNS = ["inv_mass", "gwp", "service_life"]
+
+# Building level columns renamed for display
+META_DATA_RENAMES = {
+    'total_mass_a1_to_a3': 'total_mass_a1_to_a3 (kg)',
+    'total_gwp_a1_to_a3': 'total_gwp_a1_to_a3 (kgCO₂e)',
+    'mui_a1_to_a3': 'mui_a1_to_a3 (kg/m²)',
+    'eci_a1_to_a3': 'eci_a1_to_a3 (kgCO₂e/m²)',
+}
+
+# Restrict material level metrics to only "mui (kg/m²)" and "eci (kgCO₂e/m²)"
+MATERIAL_METRICS = ["mui (kg/m²)", "eci (kgCO₂e/m²)"]
+
+# Material hierarchy of the breakdown page, outermost level first; deeper
+# levels (e.g. a product column) are appended here
+MATERIAL_HIERARCHY = ["mat_type", "mat_group"]
+
+# Metric dropdown value that charts both metrics side by side
+DUAL_METRIC = "mui+eci"
+
+MATERIAL_NUMERICAL_OPTIONS = [
+    {"label": "Material Use Intensity", "value": "mui (kg/m²)"},
+    {"label": "Embodied Carbon Intensity", "value": "eci (kgCO₂e/m²)"},
+    {"label": "MUI and ECI (side by side)", "value": DUAL_METRIC},
+]
+
+# Row scopes of ``merged_df`` materialized at load: name -> required column values
+SCOPES = {
+    "a1_to_a3_new_construction": {"life_cycle_stage": "A1-A3", "bldg_proj_type": "New Construction"},
+}
+BASE_SCOPE = "a1_to_a3_new_construction"
+
+# Derived metrics where 0 means "not reported" and must not pull down means/medians
+ZERO_AS_MISSING_COLUMNS = ['mui (kg/m²)', 'eci (kgCO₂e/m²)']
+
+_load_lock = threading.RLock()
+_load_timings = {}
+
+logger = logging.getLogger(__name__)
+
+# Rows of ``merged_df`` and its scopes are sorted by project: the rows of project ``projects[i]``
+# are ``offsets[i]:offsets[i + 1]`` and ``codes`` holds the project number of every row
+ProjectLayout = namedtuple("ProjectLayout", ["codes", "offsets", "projects"])
+
+
+def freeze_frame(df):
+    """Mark the NumPy buffers backing a DataFrame or Series read-only and return it."""
+    for block in df._mgr.blocks:
+        # ✅ Extension arrays (e.g. python-backed strings) wrap a NumPy array too
+        values = getattr(block.values, "_ndarray", block.values)
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+    return df
+
+
+def freeze(value):
+    """Freeze DataFrames, Series and arrays, including inside tuples."""
+    if isinstance(value, tuple):
+        for item in value:
+            freeze(item)
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        freeze_frame(value)
+    elif isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+def share(value):
+    """Hand out a frozen frame as a new, buffer-sharing frame object.
+
+    Callers may add columns or assign into their view without affecting any
+    other reader: with copy-on-write the write copies the touched block, and
+    without it the read-only buffers make the write raise.
+    """
+    if isinstance(value, tuple):
+        items = [share(item) for item in value]
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    return value
+
+
+def load_once(func):
+    """Run a loader at most once per process, even under concurrent first access."""
+    result = {}
+
+    @wraps(func)
+    def wrapper():
+        if "value" not in result:
+            with _load_lock:
+                if "value" not in result:
+                    result["value"] = freeze(func())
+        return share(result["value"])
+
+    wrapper.cache_clear = result.clear
+    return wrapper
+
+
+@contextmanager
+def load_phase(name):
+    """Record the wall time of one loading step under ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _load_timings[name] = time.perf_counter() - start
+
+
+def get_load_timings():
+    """Seconds spent in every load phase run so far in this process."""
+    return dict(_load_timings)
+
+
+def _require(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing file: {path}")
+    return path
+
+
+def _writable_by_others(status):
+    return status.st_uid != os.getuid() or status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def private_dir(path):
+    """Create the cache directory ``path`` for this user only and return it.
+
+    Raises ``PermissionError`` for a directory owned by another user or
+    writable by group or others: anyone who can write a pickle the app
+    loads can run code in it.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if _writable_by_others(os.stat(path)):
+        raise PermissionError(f"Cache directory {path} must be owned by this user and not writable by others")
+    return path
+
+
+def _load_private_pickle(path):
+    with open(path, "rb") as pickle_file:
+        # ✅ Checked on the open file: it cannot be swapped between the check and the load
+        if _writable_by_others(os.fstat(pickle_file.fileno())):
+            raise PermissionError(f"Refusing to load {path}: not owned by this user or writable by others")
+        return pd.read_pickle(pickle_file)
+
+
+def _read_excel_cached(path, **kwargs):
+    """``pd.read_excel`` backed by a pickle of the parsed frame, keyed by the file's size and mtime."""
+    status = os.stat(path)
+    key = hashlib.sha256(
+        repr((path, status.st_size, status.st_mtime_ns, sorted(kwargs.items()))).encode()
+    ).hexdigest()
+    try:
+        cache_dir = private_dir(PARSE_CACHE_DIR)
+    except OSError:
+        logger.warning("Not caching parsed workbooks in %s", PARSE_CACHE_DIR, exc_info=True)
+        return pd.read_excel(path, **kwargs)
+
+    cache_path = os.path.join(cache_dir, f"{os.path.basename(path)}-{key[:16]}.pkl")
+    try:
+        return _load_private_pickle(cache_path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        logger.warning("Ignoring the parsed workbook cache %s", cache_path, exc_info=True)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    df = pd.read_excel(path, **kwargs)
+    try:
+        # ✅ Write then rename, so a worker booting concurrently never reads half a pickle
+        partial_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_pickle(partial_path)
+        os.replace(partial_path, cache_path)
+    except OSError:
+        pass  # Read-only cache dir: parse on every boot instead
+    return df
+
+
+@load_once
+def _raw_results():
+    with load_phase("results_csv_parse"):
+        wblca_results_full = pd.read_csv(_require(WBLCA_RESULTS_PATH), na_values=NA_VALUES)
+
+    with load_phase("results_type_conversion"):
+        # Ensure 'project_index' is a string for merging
+        wblca_results_full['project_index'] = wblca_results_full['project_index'].astype(str)
+
+        # **Force conversion of specific columns to numeric**
+        for col in RESULTS_NUMERIC_COLUMNS:
+            wblca_results_full[col] = pd.to_numeric(wblca_results_full[col], errors='coerce')
+    return wblca_results_full
+
+
+@load_once
+def get_results_columns():
+    """Columns of the material results file, which uploaded takeoffs share."""
+    return tuple(_raw_results().columns)
+
+
+@load_once
+def _raw_meta_data():
+    with load_phase("meta_data_excel_parse"):
+        wblca_meta_data = _read_excel_cached(_require(WBLCA_META_DATA_PATH), na_values=NA_VALUES)
+    wblca_meta_data['project_index'] = wblca_meta_data['project_index'].astype(str)
+    return wblca_meta_data
+
+
+def add_derived_metrics(df):
+    """Add MUI, ECI and the GWP factor to a frame with ``inv_mass``, ``gwp`` and ``bldg_cfa``.
+
+    Shared by the benchmark data and uploaded takeoffs, so both compute the
+    metrics the same way. Modifies ``df`` in place and returns it.
+    """
+    # Compute derived columns safely
+    df['mui (kg/m²)'] = np.where(df['bldg_cfa'] != 0, df['inv_mass'] / df['bldg_cfa'], np.nan)
+    df['eci (kgCO₂e/m²)'] = np.where(df['bldg_cfa'] != 0, df['gwp'] / df['bldg_cfa'], np.nan)
+    df['gwp_factor'] = np.where(df['inv_mass'] != 0, df['gwp'] / df['inv_mass'], np.nan)
+    return df
+
+
+@load_once
+def get_merged_df():
+    """Material level results joined with building metadata, plus derived metrics."""
+    wblca_results_full, wblca_meta_data = _raw_results(), _raw_meta_data()
+    with load_phase("merge"):
+        merged_df = pd.merge(wblca_results_full, wblca_meta_data, on="project_index", how="left")
+
+    with load_phase("derived_columns"):
+        add_derived_metrics(merged_df)
+
+    with load_phase("project_sort"):
+        # ✅ Keep the rows of each project contiguous (stable, so file order is kept within a project)
+        return merged_df.sort_values('project_index', kind='stable', ignore_index=True)
+
+
+@lru_cache(maxsize=None)
+def _scope_view(scope):
+    merged_df = get_merged_df()
+    with load_phase(f"scope_view:{scope}"):
+        mask = np.ones(len(merged_df), dtype=bool)
+        for column, value in SCOPES[scope].items():
+            mask &= (merged_df[column] == value).to_numpy()
+
+        # ✅ Boolean selection keeps the project order of merged_df
+        scope_df = merged_df[mask].reset_index(drop=True)
+        for column in ZERO_AS_MISSING_COLUMNS:
+            scope_df[column] = scope_df[column].replace(0, np.nan)
+    return freeze(scope_df)
+
+
+def get_scope_df(scope=BASE_SCOPE):
+    """Rows of ``merged_df`` in one of ``SCOPES``, built once per process.
+
+    Zero values of ``ZERO_AS_MISSING_COLUMNS`` are already NaN.
+    """
+    return share(_scope_view(scope))
+
+
+def get_dataset(dataset):
+    """Frame behind a dataset name: ``"material"``, ``"building"`` or a ``SCOPES`` key."""
+    if dataset == "material":
+        return get_merged_df()
+    if dataset == "building":
+        return get_wblca_meta_data()
+    return get_scope_df(dataset)
+
+
+@lru_cache(maxsize=None)
+def get_project_layout(dataset=BASE_SCOPE):
+    """CSR-style ``ProjectLayout`` of a material level dataset, built once."""
+    codes, projects = pd.factorize(get_dataset(dataset)['project_index'], sort=True)
+    offsets = np.searchsorted(codes, np.arange(len(projects) + 1))
+    return freeze(ProjectLayout(codes, offsets, projects))
+
+
+@load_once
+def get_wblca_meta_data():
+    """Building level metadata with display names for the A1-A3 totals."""
+    return _raw_meta_data().rename(columns=META_DATA_RENAMES)
+
+
+@load_once
+def get_glossary():
+    if os.path.exists(GLOSSARY_PATH):
+        with load_phase("glossary_excel_parse"):
+            return _read_excel_cached(GLOSSARY_PATH)
+    return pd.DataFrame()  # Avoid errors if missing
+
+
+@load_once
+def get_dataset_version():
+    """Short fingerprint of the source files; changes whenever a file is replaced."""
+    fingerprint = hashlib.sha256()
+    for path in (WBLCA_RESULTS_PATH, WBLCA_META_DATA_PATH, GLOSSARY_PATH):
+        if os.path.exists(path):
+            status = os.stat(path)
+            fingerprint.update(f"{os.path.basename(path)}:{status.st_size}:{status.st_mtime_ns}".encode("utf-8"))
+    return fingerprint.hexdigest()[:16]
+
+
+@load_once
+def get_dataset_modified():
+    """Latest modification time (UTC) of the source files, for HTTP ``Last-Modified``."""
+    mtimes = [os.stat(path).st_mtime for path in (WBLCA_RESULTS_PATH, WBLCA_META_DATA_PATH, GLOSSARY_PATH)
+              if os.path.exists(path)]
+    return datetime.fromtimestamp(int(max(mtimes, default=0)), tz=timezone.utc)
+
+
+@load_once
+def get_building_columns():
+    return frozenset(get_wblca_meta_data().columns)
+
+
+# Text columns: pandas 3 reads strings as the "str" dtype, object columns hold the rest
+TEXT_DTYPES = ["object", "str"]
+
+
+def _column_options(df, include):
+    return [{"label": col, "value": col} for col in df.select_dtypes(include=include).columns]
+
+
+@load_once
+def get_categorical_options():
+    """Material page category and stack options (text columns of ``merged_df``)."""
+    return _column_options(get_merged_df(), TEXT_DTYPES)
+
+
+@load_once
+def get_material_filter_options():
+    return _column_options(get_merged_df(), TEXT_DTYPES + ["category"])
+
+
+@load_once
+def get_building_categorical_options():
+    return _column_options(get_wblca_meta_data(), TEXT_DTYPES + ["category"])
+
+
+@load_once
+def get_building_numerical_options():
+    return _column_options(get_wblca_meta_data(), ["number"])
+
+
+def get_material_numerical_options():
+    return MATERIAL_NUMERICAL_OPTIONS
+
+
+@lru_cache(maxsize=None)
+def get_filter_values(dataset, feature):
+    """Distinct non-null values of ``feature`` in a dataset (see ``get_dataset``)."""
+    return tuple(get_dataset(dataset)[feature].dropna().unique())
+
+
+@lru_cache(maxsize=None)
+def get_column_codes(column, dataset=BASE_SCOPE):
+    """Integer codes of a dataset column and its sorted distinct values.
+
+    Missing values get code -1. Factorizing once lets aggregations work on
+    integers instead of hashing strings on every request.
+    """
+    codes, uniques = pd.factorize(get_dataset(dataset)[column], sort=True)
+    return freeze(codes), uniques
+
+
+@lru_cache(maxsize=None)
+def get_column_values(column, dataset=BASE_SCOPE):
+    """Read-only NumPy array of one dataset column, without building a frame."""
+    return freeze(get_dataset(dataset)[column].to_numpy())
+
+
+def preload():
+    """Parse every dataset up front so the first request does not pay for it."""
+    get_merged_df()
+    for scope in SCOPES:
+        get_project_layout(scope)
+    get_wblca_meta_data()
+    get_glossary()
+    get_building_columns()
+    get_dataset_version()
+    get_dataset_modified()
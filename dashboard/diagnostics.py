@@ -0,0 +1,81 @@
+"""Memory, load-time and cache diagnostics of a worker process.
+
+Used by the admin diagnostics page to find out what takes the memory of a
+worker before trying to shrink it.
+"""
+import os
+
+import pandas as pd
+
+from dashboard import data_access, material_pipeline, shared_cache
+from dashboard.background_jobs import background_callback_manager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Accessors whose lru caches hold per-column or per-scope data
+DATA_ACCESS_CACHES = {
+    "scope views": data_access._scope_view,
+    "project layouts": data_access.get_project_layout,
+    "filter values": data_access.get_filter_values,
+    "column codes": data_access.get_column_codes,
+    "column values": data_access.get_column_values,
+}
+
+
+def column_profile(df):
+    """Dtype, deep memory usage, cardinality and null ratio of every column."""
+    memory = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    return pd.DataFrame({
+        "column": df.columns,
+        "dtype": [str(dtype) for dtype in df.dtypes],
+        "memory_bytes": [int(memory[col]) for col in df.columns],
+        "cardinality": [int(df[col].nunique()) for col in df.columns],
+        "null_ratio": [float(df[col].isna().sum()) / rows for col in df.columns],
+    })
+
+
+def loaded_datasets():
+    """Every frame held by ``data_access``, keyed by a display name."""
+    datasets = {
+        "merged_df": data_access.get_merged_df(),
+        "wblca_meta_data": data_access.get_wblca_meta_data(),
+        "df_glossary": data_access.get_glossary(),
+    }
+    for scope in data_access.SCOPES:
+        datasets[f"scope: {scope}"] = data_access.get_scope_df(scope)
+    return datasets
+
+
+def dataset_profiles():
+    return {name: column_profile(df) for name, df in loaded_datasets().items()}
+
+
+def cache_sizes():
+    """Entry counts (and bytes where known) of the in-process and job caches."""
+    sizes = [
+        {"cache": f"data_access: {name}", "entries": func.cache_info().currsize,
+         "maxsize": func.cache_info().maxsize, "bytes": None}
+        for name, func in DATA_ACCESS_CACHES.items()
+    ]
+    for name, info in material_pipeline.get_stage_cache_info().items():
+        sizes.append({"cache": f"stage: {name}", "entries": info.currsize, "maxsize": info.maxsize, "bytes": None})
+
+    shared = shared_cache.get_store()
+    sizes.append({"cache": "shared results (disk)", "entries": len(shared), "maxsize": None,
+                  "bytes": shared.volume()})
+
+    job_cache = background_callback_manager.handle
+    sizes.append({"cache": "background jobs (disk)", "entries": len(job_cache), "maxsize": None,
+                  "bytes": job_cache.volume()})
+    return sizes
+
+
+def process_memory():
+    """Resident set size of this worker in bytes, or ``None`` without psutil."""
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss
@@ -0,0 +1,119 @@
+"""Compact figure payloads for callback responses.
+
+Figures built with plotly carry float64 values at full precision, the whole
+default template (styling for every plotly trace type) and attributes that
+only repeat plotly.js defaults on every trace. ``compact_figure`` trims all
+of that before the figure is handed to Dash, and orjson is used as the
+encoder for the remaining JSON.
+"""
+import base64
+
+import numpy as np
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson  # noqa: F401
+    # ✅ Fast JSON encoder for every figure Dash serializes
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+# Hover labels and axis ticks never show more digits than this
+DISPLAY_SIGNIFICANT_DIGITS = 5
+
+# Trace attributes whose values are data arrays
+NUMERIC_TRACE_KEYS = ("x", "y", "base", "customdata")
+NUMERIC_ERROR_KEYS = ("array", "arrayminus")
+
+# Attributes px.bar writes on every trace although plotly.js uses them as defaults
+DEFAULT_TRACE_ATTRIBUTES = {"xaxis": "x", "yaxis": "y", "textposition": "auto"}
+
+
+def round_significant(values, digits=DISPLAY_SIGNIFICANT_DIGITS):
+    """Round a float array to ``digits`` significant digits, keeping NaN/inf."""
+    values = np.asarray(values, dtype="float64")
+    finite = np.isfinite(values) & (values != 0)
+    rounded = values.copy()
+    magnitude = np.floor(np.log10(np.abs(values[finite])))
+    scale = 10.0 ** (digits - 1 - magnitude)
+    rounded[finite] = np.round(values[finite] * scale) / scale
+    return rounded
+
+
+def _compact_array(value, digits):
+    # ✅ plotly >= 6 ships numeric arrays as base64 typed arrays
+    if isinstance(value, dict) and "bdata" in value:
+        if not value["dtype"].startswith("f"):
+            return value
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        compacted = {
+            "dtype": "f4",
+            "bdata": base64.b64encode(round_significant(array, digits).astype("float32")).decode("ascii"),
+        }
+        if "shape" in value:
+            compacted["shape"] = value["shape"]
+        return compacted
+
+    array = np.asarray(value)
+    if array.dtype.kind != "f":
+        return value
+    # ✅ float32 keeps more than the displayed precision at half the size
+    return round_significant(array, digits).astype("float32")
+
+
+def decode_array(value):
+    """Trace data as a NumPy array or list, decoding base64 typed arrays."""
+    if isinstance(value, dict) and "bdata" in value:
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        if "shape" in value:
+            # ✅ plotly writes the shape as a string, e.g. "2, 3"
+            return array.reshape([int(size) for size in str(value["shape"]).split(",")])
+        return array
+    return value
+
+
+def _strip_trace_defaults(trace):
+    for key, default in DEFAULT_TRACE_ATTRIBUTES.items():
+        if trace.get(key) == default:
+            del trace[key]
+
+    pattern = trace.get("marker", {}).get("pattern")
+    if pattern == {"shape": ""}:
+        del trace["marker"]["pattern"]
+
+
+def _strip_template(layout, trace_types):
+    """Keep the template layout and the defaults for trace types in the figure."""
+    template = layout.get("template")
+    if not template:
+        return
+    template_data = template.get("data", {})
+    template["data"] = {
+        trace_type: styles for trace_type, styles in template_data.items() if trace_type in trace_types
+    }
+
+
+def compact_figure(fig, digits=DISPLAY_SIGNIFICANT_DIGITS):
+    """Return a trimmed figure dict suitable for a ``dcc.Graph`` figure output."""
+    fig_dict = fig.to_dict() if hasattr(fig, "to_dict") else fig
+    data = fig_dict.get("data", [])
+
+    for trace in data:
+        for key in NUMERIC_TRACE_KEYS:
+            if trace.get(key) is not None:
+                trace[key] = _compact_array(trace[key], digits)
+        for error_key in ("error_x", "error_y"):
+            error = trace.get(error_key) or {}
+            for key in NUMERIC_ERROR_KEYS:
+                if error.get(key) is not None:
+                    error[key] = _compact_array(error[key], digits)
+        _strip_trace_defaults(trace)
+
+    _strip_template(fig_dict.get("layout", {}), {trace.get("type", "scatter") for trace in data})
+    return fig_dict
+
+
+def figure_payload_bytes(figure):
+    """Size of the JSON Dash sends for ``figure``, before HTTP compression."""
+    return len(to_json_plotly(figure))
@@ -0,0 +1,1081 @@
+"""Staged pipeline behind the material level chart.
+
+``process_data`` used to be one monolithic callback. It is split here into
+named stages::
+
+    filter_mask -> project_totals -> contributions -> group_statistics
+                -> group_reduction -> normalization -> category_bucketing -> figure
+
+Every stage is memoized on its own (hashable) inputs and pulls its upstream
+stages, so a change only re-executes the stages downstream of it: toggling
+``stacked_100_percent`` re-runs normalization and figure, switching mean and
+median only re-selects a column of the precomputed group statistics, and
+so on. Timings of the last
+run of every stage are available through ``get_stage_timings()``, and
+``uncached()`` runs the stages without their caches, e.g. to profile a cold
+run.
+
+All stages read the A1-A3 / New Construction base view
+(``data_access.get_scope_df``), materialized once at load. Per-project sums
+never hash ``project_index``: the view is laid out by project (see
+``data_access.get_project_layout``), so they are segmented reductions over
+contiguous runs of the selected rows. They are computed for MUI and ECI
+together (``project_sums`` and ``category_sums``), so switching metrics, or
+charting both side by side with ``data_access.DUAL_METRIC``, reuses them.
+
+In approximate quantile mode (see ``quantile_sketch``) the medians and
+quartiles come from merging the sketch buckets of the per-project cells,
+whose bucket keys are computed once per metric and category
+(``cell_sketch_keys``). Building level filters keep or drop whole projects
+and so leave the cell values unchanged: their selections gather the
+precomputed keys instead of bucketing the values again.
+
+Stacks are capped at ``MAX_STACKED_CATEGORIES`` categories: the largest
+contributors keep their own trace and the rest are folded into one
+``OTHER_CATEGORY`` trace, so a high-cardinality stacking feature cannot
+produce hundreds of traces. Every subplot of a figure (one per metric and
+facet) draws one trace per stacked category, so the cap shrinks as
+subplots are added (``stack_limit``): a figure has at most
+``MAX_FIGURE_TRACES`` stacked traces, and its payload grows with that
+bound times the number of categories on the axis.
+"""
+import inspect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from dashboard import data_access, quantile_sketch, shared_cache
+from dashboard.figure_serialization import compact_figure
+
+STAGE_MAXSIZE = 64
+
+# The per-project sums are computed for all of these at once
+METRICS = tuple(data_access.MATERIAL_METRICS)
+
+# matplotlib's "tab20" colors, precomputed so workers do not import matplotlib
+TAB20_PALETTE = np.array([
+    "rgb(31, 119, 180)", "rgb(174, 199, 232)", "rgb(255, 127, 14)", "rgb(255, 187, 120)",
+    "rgb(44, 160, 44)", "rgb(152, 223, 138)", "rgb(214, 39, 40)", "rgb(255, 152, 150)",
+    "rgb(148, 103, 189)", "rgb(197, 176, 213)", "rgb(140, 86, 75)", "rgb(196, 156, 148)",
+    "rgb(227, 119, 194)", "rgb(247, 182, 210)", "rgb(127, 127, 127)", "rgb(199, 199, 199)",
+    "rgb(188, 189, 34)", "rgb(219, 219, 141)", "rgb(23, 190, 207)", "rgb(158, 218, 229)",
+])
+
+# Largest stacked categories charted on their own (0: only MAX_FIGURE_TRACES limits them)
+MAX_STACKED_CATEGORIES = int(os.environ.get("WBLCA_MAX_STACKED_CATEGORIES", "19"))
+
+# Stacked traces of a whole figure at most: categories (and "All others") x subplots
+MAX_FIGURE_TRACES = int(os.environ.get("WBLCA_MAX_FIGURE_TRACES", "120"))
+
+# Trace that the remaining stacked categories are folded into
+OTHER_CATEGORY = "All others"
+OTHER_COLOR = "darkgray"
+
+# Small multiples: subplots per row, and the most subplots drawn (largest facets first)
+FACET_WRAP = 4
+MAX_FACETS = 20
+
+STAGE_ORDER = [
+    "filter_mask", "project_totals", "contributions", "group_statistics", "group_reduction", "normalization",
+    "category_bucketing", "figure",
+]
+
+_stage_functions = {}
+_stage_timings = {}
+_timings_lock = threading.Lock()
+
+# Set by ``uncached()`` for the current thread (or job) only
+_bypass_caches = ContextVar("bypass_stage_caches", default=False)
+
+
+def memoized_stage(name, maxsize=STAGE_MAXSIZE, shared=False):
+    """Memoize a pipeline stage and record its timing on every call.
+
+    ``shared`` stages are also kept in ``shared_cache``, so a result computed
+    by one worker or background job process is reused by all the others;
+    ``in_shared_cache(*args)`` tells whether one is there.
+    """
+    def decorator(func):
+        compute = shared_cache.memoize(name)(func) if shared else func
+        # ✅ Cached results are shared between threads and requests: freeze them
+        cached = lru_cache(maxsize=maxsize)(lambda *args: data_access.freeze(compute(*args)))
+        parameters = list(inspect.signature(func).parameters.values())
+
+        def with_defaults(args):
+            # ✅ Fill in defaults, so calls with and without optional arguments share one cache entry
+            return args + tuple(parameter.default for parameter in parameters[len(args):])
+
+        @wraps(func)
+        def wrapper(*args):
+            args = with_defaults(args)
+            if _bypass_caches.get():
+                return data_access.share(data_access.freeze(func(*args)))
+            hits_before = cached.cache_info().hits
+            start = time.perf_counter()
+            result = data_access.share(cached(*args))
+            elapsed = time.perf_counter() - start
+            cache_hit = cached.cache_info().hits > hits_before
+
+            with _timings_lock:
+                stats = _stage_timings.setdefault(
+                    name, {"calls": 0, "cache_hits": 0, "total_seconds": 0.0}
+                )
+                stats["calls"] += 1
+                stats["cache_hits"] += cache_hit
+                stats["total_seconds"] += elapsed
+                stats["last_seconds"] = elapsed
+                stats["last_cache_hit"] = cache_hit
+            return result
+
+        wrapper.in_shared_cache = lambda *args: shared and shared_cache.contains(name, with_defaults(args))
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        _stage_functions[name] = wrapper
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def uncached():
+    """Compute every stage called inside from scratch, neither reading nor filling the caches.
+
+    Only the calling thread is affected; other requests keep using the caches.
+    """
+    token = _bypass_caches.set(True)
+    try:
+        yield
+    finally:
+        _bypass_caches.reset(token)
+
+
+def get_stage_timings():
+    """Return a copy of the per-stage timing statistics.
+
+    ``last_seconds`` is inclusive of the upstream stages pulled by the call.
+    """
+    with _timings_lock:
+        return {name: dict(stats) for name, stats in _stage_timings.items()}
+
+
+def get_stage_cache_info():
+    """``functools`` cache info (hits, misses, size) of every stage."""
+    return {name: stage.cache_info() for name, stage in _stage_functions.items()}
+
+
+def clear_stage_caches():
+    for stage in _stage_functions.values():
+        stage.cache_clear()
+    with _timings_lock:
+        _stage_timings.clear()
+
+
+def normalize_filters(filter_features, filter_values):
+    """Turn the pattern-matching filter inputs into a hashable key.
+
+    Features and values are sorted, so the same filters picked in another
+    order (or sent to the API) share one cache key.
+    """
+    if not filter_features or not filter_values:
+        return ()
+    return tuple(sorted(
+        (feature, tuple(sorted(values)))
+        for feature, values in zip(filter_features, filter_values)
+        if values
+    ))
+
+
+def is_building_level(secondary_cat_feature):
+    return secondary_cat_feature in data_access.get_building_columns()
+
+
+def code_selection(column, values, rows=None):
+    """Row mask of ``base_df[column].isin(values)``, evaluated on the column's integer codes.
+
+    Only the base view positions ``rows`` are evaluated when given.
+    """
+    codes, uniques = data_access.get_column_codes(column)
+    wanted = uniques.get_indexer(list(values))
+    # ✅ One slot per code plus a trailing False slot for missing values (code -1)
+    selected = np.zeros(len(uniques) + 1, dtype=bool)
+    selected[wanted[wanted >= 0]] = True
+    return selected[codes if rows is None else codes[rows]]
+
+
+@memoized_stage("filter_mask")
+def filter_mask(filters):
+    """Boolean row mask of the user filters over the A1-A3 / New Construction base view.
+
+    Only the filtered columns are read. The mask of ``filters`` is the
+    (memoized) mask of all but the last filter and'ed with the last one, so
+    adding a filter, e.g. a cross-filter selection, costs one column.
+    """
+    if not filters:
+        return np.ones(len(data_access.get_project_layout().codes), dtype=bool)
+    return filter_mask(filters[:-1]) & code_selection(*filters[-1])
+
+
+def project_segments(mask):
+    """Project codes and start positions of the project segments among the selected rows.
+
+    Selected rows keep the project order of the load-time layout, so each
+    project's rows form one contiguous segment and no grouping is needed.
+    """
+    layout = data_access.get_project_layout()
+    # ✅ Position of every project boundary within the selected rows
+    bounds = np.concatenate(([0], np.cumsum(mask)))[layout.offsets]
+    present = np.flatnonzero(np.diff(bounds))
+    return present, bounds[present]
+
+
+def metric_values(mask, numerical_feature):
+    """Selected metric values, with the NaNs groupby sums skip set to 0."""
+    values = data_access.get_column_values(numerical_feature)[mask].astype('float64', copy=False)
+    # ✅ Boolean indexing already returned a private copy of the selected rows
+    values[np.isnan(values)] = 0.0
+    return values
+
+
+def segment_sums(values, starts):
+    if not len(starts):
+        return np.empty((0,) + values.shape[1:])
+    return np.add.reduceat(values, starts, axis=0)
+
+
+def pair_sums(mask, category):
+    """Per-project sums of every metric for every category present in each project.
+
+    Equivalent to ``groupby(['project_index', category])[METRICS].sum()``: the
+    category is integer-coded once at load and the (project, category) pairs
+    are reduced with ``np.bincount``, in project then category order.
+    """
+    layout = data_access.get_project_layout()
+    category_codes, categories = data_access.get_column_codes(category)
+    project_codes = layout.codes[mask]
+    category_codes = category_codes[mask]
+
+    # ✅ Missing categories are dropped, as groupby does
+    keep = category_codes >= 0
+    keys = project_codes[keep].astype('int64') * len(categories) + category_codes[keep]
+    if len(layout.projects) * len(categories) <= 4 * len(keys) + 1024:
+        counts = np.bincount(keys, minlength=len(layout.projects) * len(categories))
+        pairs = np.flatnonzero(counts)
+        sums = {
+            metric: np.bincount(keys, weights=metric_values(mask, metric)[keep], minlength=len(counts))[pairs]
+            for metric in METRICS
+        }
+    else:
+        # ✅ Too many possible pairs for a dense table: sort the integer keys instead
+        pairs, inverse = np.unique(keys, return_inverse=True)
+        sums = {
+            metric: np.bincount(inverse, weights=metric_values(mask, metric)[keep], minlength=len(pairs))
+            for metric in METRICS
+        }
+
+    return pd.DataFrame({
+        'project_index': layout.projects.take(pairs // len(categories)),
+        category: categories.take(pairs % len(categories)),
+        **sums,
+    })
+
+
+@memoized_stage("project_sums", shared=True)
+def project_sums(filters):
+    """Per-project sums of every metric, as one segmented reduction over the metric columns.
+
+    Returns ``(sums, first_rows)``; ``first_rows`` are the base view rows
+    where each project's selected segment starts.
+    """
+    mask = filter_mask(filters)
+    layout = data_access.get_project_layout()
+    present, starts = project_segments(mask)
+    values = np.column_stack([metric_values(mask, metric) for metric in METRICS])
+    sums = segment_sums(values, starts)
+    frame = pd.DataFrame({
+        'project_index': layout.projects.take(present),
+        **{metric: sums[:, i] for i, metric in enumerate(METRICS)},
+    })
+    return frame, np.flatnonzero(mask)[starts]
+
+
+@memoized_stage("category_sums", shared=True)
+def category_sums(filters, category):
+    """``pair_sums`` of the filtered rows, for every metric at once."""
+    return pair_sums(filter_mask(filters), category)
+
+
+@memoized_stage("project_totals")
+def project_totals(filters, numerical_feature, secondary_cat_feature):
+    if is_building_level(secondary_cat_feature):
+        # ✅ Compute total material intensity per project as one segmented sum
+        sums, first_rows = project_sums(filters)
+        category_codes, categories = data_access.get_column_codes(secondary_cat_feature)
+        # ✅ Building level features are constant within a project: read them at the segment start
+        return pd.DataFrame({
+            'project_index': sums['project_index'],
+            'total_material_intensity': sums[numerical_feature],
+            secondary_cat_feature: categories.take(category_codes[first_rows], allow_fill=True),
+        })
+
+    # ✅ Material level categories are summed per project and category
+    return category_sums(filters, secondary_cat_feature)[['project_index', secondary_cat_feature, numerical_feature]]
+
+
+@memoized_stage("contributions", shared=True)
+def contributions(filters, numerical_feature, secondary_cat_feature, primary_cat_feature):
+    """Per-project sums of ``primary_cat_feature``.
+
+    Returns ``(contributions, primary_to_secondary)``; the mapping is only
+    needed (and only computed) for material level secondary categories.
+    """
+    project_grouped_primary = category_sums(filters, primary_cat_feature)[
+        ['project_index', primary_cat_feature, numerical_feature]
+    ]
+
+    if is_building_level(secondary_cat_feature):
+        # ✅ Compute contribution fraction per project
+        totals = project_totals(filters, numerical_feature, secondary_cat_feature)
+        project_grouped_primary = project_grouped_primary.merge(totals, on='project_index', how='left')
+        project_grouped_primary['primary_cat_contribution'] = (
+            project_grouped_primary[numerical_feature] / project_grouped_primary['total_material_intensity']
+        )
+        return project_grouped_primary, None
+
+    # ✅ Map primary_cat_feature to secondary_cat_feature
+    return project_grouped_primary, category_pairs(filter_mask(filters), secondary_cat_feature, primary_cat_feature)
+
+
+def category_pairs(mask, first, second):
+    """Distinct ``(first, second)`` pairs of the selected rows, in order of appearance.
+
+    Same result as ``base_df.loc[mask, [first, second]].drop_duplicates()``
+    but only the two integer code columns are read.
+    """
+    first_codes, first_values = data_access.get_column_codes(first)
+    second_codes, second_values = data_access.get_column_codes(second)
+    # ✅ Shift codes by one so missing values (-1) form pairs of their own
+    keys = (first_codes[mask] + 1).astype('int64') * (len(second_values) + 1) + (second_codes[mask] + 1)
+    _, first_seen = np.unique(keys, return_index=True)
+    keys = keys[np.sort(first_seen)]
+    return pd.DataFrame({
+        first: first_values.take(keys // (len(second_values) + 1) - 1, allow_fill=True),
+        second: second_values.take(keys % (len(second_values) + 1) - 1, allow_fill=True),
+    })
+
+
+@lru_cache(maxsize=None)
+def project_facets(facet):
+    """``project_index`` and the value of the building level column ``facet`` of every project."""
+    layout = data_access.get_project_layout()
+    codes, values = data_access.get_column_codes(facet)
+    # ✅ Building level features are constant within a project: read them at its first row
+    return data_access.freeze(pd.DataFrame({
+        'project_index': layout.projects,
+        facet: values.take(codes[layout.offsets[:-1]], allow_fill=True),
+    }))
+
+
+def with_facet(frame, facet):
+    """Per-project ``frame`` with the project's ``facet`` value added (unchanged without a facet)."""
+    if not facet:
+        return frame
+    return frame.merge(project_facets(facet), on='project_index', how='left')
+
+
+def group_keys(category, facet):
+    """Columns a reduction by ``category`` groups on: the facet comes first when there is one."""
+    return [facet, category] if facet else [category]
+
+
+@lru_cache(maxsize=None)
+def cell_sketch_keys(numerical_feature, category=None, share=False):
+    """Quantile sketch bucket keys of the unfiltered per-project cells.
+
+    A cell is a project (``category`` of ``None``) or a (project,
+    ``category``) pair and its value the per-project sum of
+    ``numerical_feature``; ``share`` divides it by the project's total.
+    Returns ``(projects, keys)``: the project code and bucket key of every
+    cell, in the order the stages list the cells.
+    """
+    if category is None:
+        cells, _ = project_sums(())
+        values = cells[numerical_feature].to_numpy(dtype="float64")
+    else:
+        cells = category_sums((), category)
+        values = cells[numerical_feature].to_numpy(dtype="float64")
+        if share:
+            totals = project_sums(())[0].set_index('project_index')[numerical_feature]
+            values = values / totals.reindex(cells['project_index']).to_numpy(dtype="float64")
+    projects = data_access.get_project_layout().projects.get_indexer(cells['project_index'])
+    keys = quantile_sketch.bucket_keys(values)
+    projects.flags.writeable = keys.flags.writeable = False
+    return projects, keys
+
+
+def selection_sketch_keys(filters, numerical_feature, category=None, share=False,
+                          quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Bucket keys of the selected cells (see ``cell_sketch_keys``), or ``None`` to bucket their values.
+
+    Only selections filtered on building level features alone reuse the
+    precomputed keys: their cells are the unfiltered cells of the selected
+    projects, in the same order and with the same values.
+    """
+    if not quantile_sketch.approximate(quantile_mode) or not all(is_building_level(f) for f, _ in filters):
+        return None
+    projects, keys = cell_sketch_keys(numerical_feature, category, share)
+    # ✅ Building level features are constant within a project: read the filters at its first row
+    first_rows = data_access.get_project_layout().offsets[:-1]
+    selected = np.ones(len(first_rows), dtype=bool)
+    for column, values in filters:
+        selected &= code_selection(column, values, first_rows)
+    return keys[selected[projects]]
+
+
+def describe_groups(df, by, value_col, quantile_mode=quantile_sketch.QUANTILE_MODE, sketch_keys=None):
+    """Count, sum, mean, median and quartiles of ``value_col`` per group.
+
+    All statistics come from one ``groupby`` object, so the group keys are
+    factorized once for all of them. In approximate quantile mode the median
+    and quartiles are read from one quantile sketch per group, merged from
+    ``sketch_keys`` (the bucket key of every row) when given.
+    """
+    grouped = df.groupby(by)[value_col]
+    if quantile_sketch.approximate(quantile_mode):
+        stats = grouped.agg(["count", "sum", "mean"])
+        if sketch_keys is None:
+            sketch_keys = quantile_sketch.bucket_keys(df[value_col].to_numpy(dtype="float64"))
+        sketches = quantile_sketch.group_sketches(sketch_keys, quantile_sketch.ngroup_codes(grouped), grouped.ngroups)
+        stats["median"], stats["q1"], stats["q3"] = quantile_sketch.quantiles(sketches, (0.5, 0.25, 0.75)).T
+        return stats.reset_index()
+
+    stats = grouped.agg(["count", "sum", "mean", "median"])
+    # ✅ Reindexed: an empty selection has no quantile columns to unstack
+    quartiles = grouped.quantile([0.25, 0.75]).unstack().reindex(columns=[0.25, 0.75])
+    stats["q1"] = quartiles[0.25]
+    stats["q3"] = quartiles[0.75]
+    return stats.reset_index()
+
+
+@memoized_stage("group_statistics", shared=True)
+def group_statistics(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, facet=None,
+                     quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Every reduction the chart can use, independent of the aggregation method.
+
+    Returns ``(secondary_stats, contribution_stats)`` as produced by
+    ``describe_groups``; ``contribution_stats`` is ``None`` when no stacking
+    feature is selected. Switching between mean and median only selects a
+    different column from these tables. With a building level ``facet``
+    every group is split by it in the same pass.
+    """
+    totals = with_facet(project_totals(filters, numerical_feature, secondary_cat_feature), facet)
+    building_level = is_building_level(secondary_cat_feature)
+    value_col = 'total_material_intensity' if building_level else numerical_feature
+
+    secondary_stats = describe_groups(
+        totals, group_keys(secondary_cat_feature, facet), value_col, quantile_mode,
+        selection_sketch_keys(
+            filters, numerical_feature, None if building_level else secondary_cat_feature,
+            quantile_mode=quantile_mode,
+        ),
+    )
+    if not primary_cat_feature:
+        return secondary_stats, None
+
+    project_contributions, _ = contributions(
+        filters, numerical_feature, secondary_cat_feature, primary_cat_feature
+    )
+    # ✅ Per (project, primary category) cells: shares of the project total for building level categories
+    contribution_keys = selection_sketch_keys(
+        filters, numerical_feature, primary_cat_feature, building_level, quantile_mode
+    )
+    if building_level:
+        contribution_stats = describe_groups(
+            with_facet(project_contributions, facet),
+            group_keys(secondary_cat_feature, facet) + [primary_cat_feature], 'primary_cat_contribution',
+            quantile_mode, contribution_keys,
+        )
+    else:
+        contribution_stats = describe_groups(
+            with_facet(project_contributions, facet), group_keys(primary_cat_feature, facet), numerical_feature,
+            quantile_mode, contribution_keys,
+        )
+    return secondary_stats, contribution_stats
+
+
+@memoized_stage("group_reduction")
+def group_reduction(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+                    facet=None, quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Mean or median reduction by ``secondary_cat_feature`` (and ``facet``).
+
+    Returns ``(secondary_totals, output_df)``. ``secondary_totals`` keeps the
+    other group statistics next to ``secondary_cat_agg``; ``output_df`` is
+    ``None`` when no stacking feature is selected.
+    """
+    secondary_stats, contribution_stats = group_statistics(
+        filters, numerical_feature, secondary_cat_feature, primary_cat_feature, facet, quantile_mode
+    )
+    secondary_totals = secondary_stats.rename(columns={aggregation: 'secondary_cat_agg'})
+    if not primary_cat_feature:
+        return secondary_totals, None
+    keys = group_keys(secondary_cat_feature, facet)
+    secondary_agg = secondary_totals[keys + ['secondary_cat_agg']]
+
+    if is_building_level(secondary_cat_feature):
+        # ✅ Mean/median contributions by secondary_cat_feature
+        contribution_means = contribution_stats[keys + [primary_cat_feature, aggregation]].rename(
+            columns={aggregation: 'primary_cat_contribution'}
+        )
+
+        # ✅ Normalize contributions to sum to 100%
+        contribution_means['normalized_contribution'] = (
+            contribution_means.groupby(keys)['primary_cat_contribution'].transform(lambda x: x / x.sum())
+        )
+
+        # ✅ Compute contributions to totals
+        contribution_means = contribution_means.merge(secondary_agg, on=keys, how='left')
+        contribution_means['normalized_agg_contribution'] = (
+            contribution_means['normalized_contribution'] * contribution_means['secondary_cat_agg']
+        )
+        return secondary_totals, contribution_means[
+            keys + [primary_cat_feature, 'normalized_agg_contribution']
+        ]
+
+    _, primary_to_secondary = contributions(
+        filters, numerical_feature, secondary_cat_feature, primary_cat_feature
+    )
+    primary_cat_stats = contribution_stats[group_keys(primary_cat_feature, facet) + [aggregation]].rename(
+        columns={aggregation: 'primary_agg'}
+    )
+
+    # ✅ Merge primary stats with secondary stats via mapping
+    primary_cat_stats = primary_cat_stats.merge(primary_to_secondary, on=primary_cat_feature, how='left')
+    primary_cat_stats = primary_cat_stats.merge(secondary_agg, on=keys, how='left')
+
+    # ✅ Calculate contribution percentage per primary category
+    primary_cat_stats['contribution'] = (
+        primary_cat_stats['primary_agg'] / primary_cat_stats.groupby(keys)['primary_agg'].transform('sum')
+    )
+
+    # ✅ Normalize contributions based on secondary_cat_feature stats
+    primary_cat_stats['normalized_agg'] = primary_cat_stats['contribution'] * primary_cat_stats['secondary_cat_agg']
+
+    return secondary_totals, primary_cat_stats[
+        keys + [primary_cat_feature, 'normalized_agg', 'contribution']
+    ].sort_values(by=keys + ['normalized_agg'], ascending=[True] * len(keys) + [False])
+
+
+@memoized_stage("normalization", shared=True)
+def normalization(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+                  stacked_100_percent, facet=None, quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Scale stacked contributions to 100% per category when requested."""
+    secondary_totals, output_df = group_reduction(
+        filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation, facet, quantile_mode
+    )
+    if output_df is None or not stacked_100_percent:
+        return secondary_totals, output_df
+
+    value_col = 'normalized_agg_contribution' if is_building_level(secondary_cat_feature) else 'normalized_agg'
+    total_per_category = output_df.groupby(group_keys(secondary_cat_feature, facet))[value_col].transform('sum')
+    return secondary_totals, output_df.assign(**{value_col: output_df[value_col] / total_per_category})
+
+
+def _value_columns(output_df, category_col, group_cols):
+    group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+    return group_cols, [column for column in output_df.columns if column != category_col and column not in group_cols]
+
+
+def top_category_values(output_df, category_col, group_cols, k):
+    """The ``k`` categories with the largest total, or ``None`` when all of them are kept.
+
+    The totals over all groups are ranked with a partial sort. Frames with
+    at most ``k + 1`` categories, or ``k`` of 0, keep all of them.
+    """
+    codes, uniques = pd.factorize(output_df[category_col], sort=False)
+    if not k or len(uniques) <= k + 1:
+        return None
+
+    _, value_cols = _value_columns(output_df, category_col, group_cols)
+    # ✅ The first value column is the stacked bar height
+    totals = np.bincount(codes, weights=np.nan_to_num(output_df[value_cols[0]].to_numpy(dtype="float64")),
+                         minlength=len(uniques))
+    return uniques[np.argpartition(-totals, k - 1)[:k]]
+
+
+def fold_categories(output_df, category_col, group_cols, kept):
+    """Fold the categories not in ``kept`` into ``OTHER_CATEGORY``, summed per ``group_cols``.
+
+    ``group_cols`` is a column or list of columns; a ``kept`` of ``None``
+    returns the frame unchanged.
+    """
+    if kept is None:
+        return output_df
+
+    group_cols, value_cols = _value_columns(output_df, category_col, group_cols)
+    kept_rows = output_df[category_col].isin(kept).to_numpy()
+    other = output_df[~kept_rows].groupby(group_cols, sort=False, observed=True, as_index=False)[value_cols].sum()
+    other[category_col] = OTHER_CATEGORY
+    return pd.concat([output_df[kept_rows], other[output_df.columns]], ignore_index=True)
+
+
+def top_categories(output_df, category_col, group_cols, k):
+    """Keep the ``k`` categories with the largest total and fold the rest into ``OTHER_CATEGORY``.
+
+    See ``top_category_values`` and ``fold_categories``.
+    """
+    return fold_categories(
+        output_df, category_col, group_cols, top_category_values(output_df, category_col, group_cols, k)
+    )
+
+
+def stack_limit(subplots):
+    """Stacked categories kept per subplot, so that ``subplots`` of them stay within ``MAX_FIGURE_TRACES``.
+
+    Never more than ``MAX_STACKED_CATEGORIES`` (when set), and at least one
+    next to the "other" trace.
+    """
+    budget = max(MAX_FIGURE_TRACES // max(subplots, 1) - 1, 1)
+    return min(MAX_STACKED_CATEGORIES, budget) if MAX_STACKED_CATEGORIES else budget
+
+
+def facet_limit(n_metrics=1):
+    """Facets charted at most: ``MAX_FACETS``, and few enough to leave every subplot a stacked category."""
+    return min(MAX_FACETS, max(MAX_FIGURE_TRACES // (2 * n_metrics), 1))
+
+
+def charted_facets(secondary_totals, facet, n_metrics=1):
+    """Values of ``facet`` charted as subplots: those with the most projects in the category groups."""
+    projects = secondary_totals.groupby(facet)['count'].sum()
+    return projects.sort_values(ascending=False, kind='stable').index[:facet_limit(n_metrics)].tolist()
+
+
+@memoized_stage("category_bucketing")
+def category_bucketing(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+                       stacked_100_percent, facet=None, quantile_mode=quantile_sketch.QUANTILE_MODE,
+                       metrics=None):
+    """Cap the stacked categories of the chart at ``stack_limit`` plus one "other" trace.
+
+    ``metrics`` are the metrics charted side by side with this one, if any:
+    the largest categories are then those of the first of them, so every
+    panel keeps the same categories, and the trace budget is shared by all
+    their subplots. With a ``facet`` only the charted facets
+    (``charted_facets``) are kept, every one of them a subplot, and the
+    categories are ranked over all of them together.
+    """
+    secondary_totals, output_df = normalization(
+        filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent,
+        facet, quantile_mode
+    )
+    if output_df is None:
+        return secondary_totals, None
+
+    metrics = metrics or (numerical_feature,)
+    keys = group_keys(secondary_cat_feature, facet)
+    ranked_totals, ranked_df = secondary_totals, output_df
+    if metrics[0] != numerical_feature:
+        ranked_totals, ranked_df = normalization(
+            filters, metrics[0], secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent,
+            facet, quantile_mode
+        )
+    subplots = len(metrics)
+    if facet:
+        facet_values = charted_facets(ranked_totals, facet, len(metrics))
+        output_df = output_df[output_df[facet].isin(facet_values)]
+        ranked_df = ranked_df[ranked_df[facet].isin(facet_values)]
+        subplots *= len(facet_values)
+    kept = top_category_values(ranked_df, primary_cat_feature, keys, stack_limit(subplots))
+    return secondary_totals, fold_categories(output_df, primary_cat_feature, keys, kept)
+
+
+def generate_color_map(categories):
+    """Generate a distinct color for each category using the tab20 palette"""
+    categories = [category for category in categories if category != OTHER_CATEGORY]
+    # ✅ Same colors as matplotlib's get_cmap('tab20', n): n evenly spaced picks from the 20 colors
+    n_colors = len(TAB20_PALETTE)
+    picks = np.minimum((np.linspace(0, 1, len(categories)) * n_colors).astype(int), n_colors - 1)
+    color_map = dict(zip(categories, TAB20_PALETTE[picks].tolist()))
+    color_map[OTHER_CATEGORY] = OTHER_COLOR
+    return color_map
+
+
+@memoized_stage("figure", shared=True)
+def figure(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+           stacked_100_percent, graph_width, graph_height, log_y_axis, facet=None,
+           quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Build the chart and return it as a compacted figure dict."""
+    if facet:
+        return facet_figure(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+                            stacked_100_percent, graph_width, graph_height, log_y_axis, facet, quantile_mode)
+    if numerical_feature == data_access.DUAL_METRIC:
+        return dual_figure(filters, secondary_cat_feature, primary_cat_feature, aggregation,
+                           stacked_100_percent, graph_width, graph_height, log_y_axis, quantile_mode)
+
+    secondary_totals, output_df = category_bucketing(
+        filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent,
+        None, quantile_mode
+    )
+    building_level = is_building_level(secondary_cat_feature)
+
+    # ✅ If primary_cat_feature is None, generate a simple bar chart
+    if output_df is None:
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=secondary_totals[secondary_cat_feature],
+            y=secondary_totals['secondary_cat_agg'],
+            name=aggregation.capitalize(),
+            marker=dict(color='blue'),
+            # ✅ Group statistics computed alongside the aggregate come for free in the tooltip
+            customdata=secondary_totals[['count', 'q1', 'q3']],
+            hovertemplate=(
+                f"{secondary_cat_feature}=%{{x}}<br>{aggregation.capitalize()}=%{{y:.4g}}"
+                "<br>Projects=%{customdata[0]}<br>Q1=%{customdata[1]:.4g}<br>Q3=%{customdata[2]:.4g}"
+                "<extra></extra>"
+            ),
+        ))
+
+        if building_level:
+            fig.update_layout(
+                title=f"Bar Chart of {numerical_feature} by {secondary_cat_feature} ({aggregation.capitalize()})",
+                xaxis_title=secondary_cat_feature,
+                yaxis_title=numerical_feature,
+                plot_bgcolor='white',
+                paper_bgcolor='white',
+                width=graph_width if graph_width else 800,
+                height=graph_height if graph_height else 600,
+                font=dict(family="Open Sans", size=12),
+                xaxis=dict(showgrid=False),
+                yaxis=dict(
+                    showgrid=True,
+                    gridcolor='rgba(200, 200, 200, 0.5)',
+                    type="log" if log_y_axis else "linear"
+                )
+            )
+        else:
+            fig.update_layout(
+                title=f"Bar Chart of {numerical_feature} by {secondary_cat_feature} ({aggregation.capitalize()})",
+                xaxis_title=secondary_cat_feature,
+                yaxis_title=numerical_feature,
+                legend_title="Total",
+                plot_bgcolor='white',
+                paper_bgcolor='white',
+                width=graph_width if graph_width else 800,
+                height=graph_height if graph_height else 600,
+                font={'family': 'Open Sans'},
+                xaxis=dict(showgrid=False),
+                yaxis=dict(
+                    showgrid=True,
+                    gridcolor='rgba(200, 200, 200, 0.5)',
+                    type="log" if log_y_axis else "linear"
+                ) if not stacked_100_percent else dict(
+                    showgrid=True, gridcolor='rgba(200, 200, 200, 0.5)'
+                )  # ✅ Log scale only when not 100% stacked
+            )
+        return compact_figure(fig)
+
+    y_label = "Percentage Contribution (%)" if stacked_100_percent else numerical_feature
+    title = (
+        f"Stacked Bar Plot of {primary_cat_feature} Contributions by {secondary_cat_feature} "
+        f"({aggregation.capitalize()})"
+    )
+
+    import plotly.express as px  # ✅ Deferred: plotly.express is slow to import and only needed here
+
+    folded = (output_df[primary_cat_feature] == OTHER_CATEGORY).any()
+
+    if building_level:
+        # Generate color mapping based on unique primary_cat_feature
+        color_mapping = generate_color_map(output_df[primary_cat_feature].unique())
+        fig = px.bar(
+            output_df,
+            x=secondary_cat_feature,
+            y="normalized_agg_contribution",
+            color=primary_cat_feature,
+            barmode="relative" if stacked_100_percent else "stack",
+            color_discrete_map=color_mapping,  # ✅ Apply custom color mapping
+            labels={secondary_cat_feature: secondary_cat_feature, "normalized_agg_contribution": y_label},
+            title=title,
+        )
+        yaxis = dict(
+            showgrid=True,
+            gridcolor="lightgray",
+            gridwidth=0.5,
+            type="log" if log_y_axis and not stacked_100_percent else "linear",
+            tickformat=".0%" if stacked_100_percent else None,
+            range=[0, 1] if stacked_100_percent else None  # ✅ Ensures 0-100% range for stacked mode
+        )
+    else:
+        fig = px.bar(
+            output_df,
+            x=secondary_cat_feature,
+            y="normalized_agg",
+            color=primary_cat_feature,
+            barmode="relative" if stacked_100_percent else "stack",
+            # ✅ Only when folded: any color_discrete_map shifts the default color sequence
+            color_discrete_map={OTHER_CATEGORY: OTHER_COLOR} if folded else None,
+            labels={secondary_cat_feature: secondary_cat_feature, "normalized_agg": y_label},
+            title=title,
+        )
+        yaxis = dict(
+            showgrid=True,
+            gridcolor="lightgray",
+            gridwidth=0.5,
+            type="log" if log_y_axis else "linear",
+            tickformat=".0%" if stacked_100_percent else None
+        )
+
+    fig.update_layout(
+        font=dict(family="Open Sans", size=12),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        width=graph_width if graph_width else 800,
+        height=graph_height if graph_height else 600,
+        margin=dict(l=40, r=40, t=40, b=40),
+        xaxis=dict(showgrid=False, gridcolor="lightgray", gridwidth=0.5),
+        yaxis=yaxis,
+    )
+    return compact_figure(fig)
+
+
+def dual_figure(filters, secondary_cat_feature, primary_cat_feature, aggregation,
+                stacked_100_percent, graph_width, graph_height, log_y_axis,
+                quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """MUI and ECI as two coupled subplots sharing the category axis.
+
+    Both metrics come out of the same per-project sums, so this costs about
+    as much as one metric. The stacks keep the largest categories of the
+    first metric in both panels and use one color map for both.
+    """
+    fig = make_subplots(rows=len(METRICS), cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=METRICS)
+    value_col = 'normalized_agg_contribution' if is_building_level(secondary_cat_feature) else 'normalized_agg'
+    tables = [
+        category_bucketing(
+            filters, metric, secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent,
+            None, quantile_mode, METRICS
+        )
+        for metric in METRICS
+    ]
+    color_mapping = generate_color_map(pd.unique(pd.concat(
+        [output_df[primary_cat_feature] for _, output_df in tables if output_df is not None], ignore_index=True
+    ))) if primary_cat_feature else {}
+    legend_shown = set()
+
+    for row, (metric, (secondary_totals, output_df)) in enumerate(zip(METRICS, tables), start=1):
+        if output_df is None:
+            fig.add_trace(go.Bar(
+                x=secondary_totals[secondary_cat_feature],
+                y=secondary_totals['secondary_cat_agg'],
+                name=metric,
+                marker=dict(color='blue'),
+                showlegend=False,
+                customdata=secondary_totals[['count', 'q1', 'q3']],
+                hovertemplate=(
+                    f"{secondary_cat_feature}=%{{x}}<br>{aggregation.capitalize()}=%{{y:.4g}}"
+                    "<br>Projects=%{customdata[0]}<br>Q1=%{customdata[1]:.4g}<br>Q3=%{customdata[2]:.4g}"
+                    "<extra></extra>"
+                ),
+            ), row=row, col=1)
+        else:
+            for category, category_df in output_df.groupby(primary_cat_feature, sort=False):
+                fig.add_trace(go.Bar(
+                    x=category_df[secondary_cat_feature],
+                    y=category_df[value_col],
+                    name=str(category),
+                    legendgroup=str(category),
+                    showlegend=category not in legend_shown,  # ✅ One legend entry per category for both panels
+                    marker=dict(color=color_mapping[category]),
+                ), row=row, col=1)
+                legend_shown.add(category)
+
+        fig.update_yaxes(
+            title_text="Percentage Contribution (%)" if stacked_100_percent and primary_cat_feature else metric,
+            showgrid=True,
+            gridcolor="lightgray",
+            gridwidth=0.5,
+            type="log" if log_y_axis and not stacked_100_percent else "linear",
+            tickformat=".0%" if stacked_100_percent and primary_cat_feature else None,
+            row=row, col=1,
+        )
+
+    fig.update_xaxes(showgrid=False)
+    fig.update_xaxes(title_text=secondary_cat_feature, row=len(METRICS), col=1)
+    fig.update_layout(
+        title=f"MUI and ECI by {secondary_cat_feature} ({aggregation.capitalize()})",
+        barmode="relative" if stacked_100_percent else "stack",
+        legend_title=primary_cat_feature,
+        font=dict(family="Open Sans", size=12),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        width=graph_width if graph_width else 800,
+        height=graph_height if graph_height else 900,
+        margin=dict(l=40, r=40, t=80, b=40),
+    )
+    return compact_figure(fig)
+
+
+def facet_for(facet, secondary_cat_feature, primary_cat_feature):
+    """``facet`` if the chart can be split by it, else ``None``.
+
+    Only building level features facet the chart, and not the ones already
+    on its category axis or stacks.
+    """
+    if not facet or facet in (secondary_cat_feature, primary_cat_feature) or not is_building_level(facet):
+        return None
+    return facet
+
+
+def facet_figure(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+                 stacked_100_percent, graph_width, graph_height, log_y_axis, facet,
+                 quantile_mode=quantile_sketch.QUANTILE_MODE):
+    """Small multiples: the chart once per value of the building level ``facet``.
+
+    The stages reduce by ``[facet, secondary_cat_feature]`` in one grouped
+    pass, and the whole grid is laid out by one plotly express call over
+    that table, so it costs about as much as a single chart: all subplots
+    share one trace budget (``MAX_FIGURE_TRACES``, see ``stack_limit``).
+    At most ``facet_limit`` facets are drawn, those with the most projects;
+    in the dual-metric mode each metric gets a row of its own, with the
+    stacked categories of the first metric.
+    """
+    import plotly.express as px  # ✅ Deferred: plotly.express is slow to import and only needed here
+
+    metrics = METRICS if numerical_feature == data_access.DUAL_METRIC else (numerical_feature,)
+    if not primary_cat_feature:
+        value_col = 'secondary_cat_agg'
+    elif is_building_level(secondary_cat_feature):
+        value_col = 'normalized_agg_contribution'
+    else:
+        value_col = 'normalized_agg'
+
+    tables = []
+    for metric in metrics:
+        secondary_totals, output_df = category_bucketing(
+            filters, metric, secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent, facet,
+            quantile_mode, metrics if len(metrics) > 1 else None
+        )
+        if not tables:
+            # ✅ Same facets as category_bucketing kept, largest first
+            n_facets = secondary_totals[facet].nunique()
+            facet_values = charted_facets(secondary_totals, facet, len(metrics))
+        tables.append((secondary_totals if output_df is None else output_df).assign(metric=metric))
+    table = pd.concat(tables, ignore_index=True)
+    table = table[table[facet].isin(facet_values)]
+
+    dual = len(metrics) > 1
+    wrap = 0 if dual else FACET_WRAP
+    n_rows = len(metrics) if dual else math.ceil(len(facet_values) / FACET_WRAP)
+    n_cols = len(facet_values) if dual else min(len(facet_values), FACET_WRAP)
+    stacked = primary_cat_feature and stacked_100_percent
+    y_label = "Percentage Contribution (%)" if stacked else (
+        "Value" if dual else numerical_feature
+    )
+    shown = f", {len(facet_values)} largest of {n_facets}" if n_facets > len(facet_values) else ""
+
+    fig = px.bar(
+        table,
+        x=secondary_cat_feature,
+        y=value_col,
+        color=primary_cat_feature or None,
+        facet_col=facet,
+        facet_col_wrap=wrap,
+        facet_row='metric' if dual else None,
+        category_orders={facet: facet_values, 'metric': list(metrics)},
+        barmode="relative" if stacked_100_percent else "stack",
+        # ✅ One color map for every subplot, so a category has the same color in all of them
+        color_discrete_map=generate_color_map(table[primary_cat_feature].unique()) if primary_cat_feature else None,
+        color_discrete_sequence=None if primary_cat_feature else ['blue'],
+        hover_data=None if primary_cat_feature else {'count': True, 'q1': ':.4g', 'q3': ':.4g'},
+        labels={value_col: y_label, 'count': 'Projects', 'q1': 'Q1', 'q3': 'Q3', 'metric': 'Metric'},
+        title=f"{' and '.join(metrics)} by {secondary_cat_feature} per {facet} ({aggregation.capitalize()}{shown})",
+    )
+    # ✅ Subplot titles read "value" instead of "column=value"
+    fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split("=", 1)[-1]))
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(
+        showgrid=True,
+        gridcolor="lightgray",
+        gridwidth=0.5,
+        type="log" if log_y_axis and not stacked else "linear",
+        tickformat=".0%" if stacked else None,
+    )
+    if dual:
+        # ✅ MUI and ECI have different units: each metric row gets its own y range
+        fig.update_yaxes(matches=None, showticklabels=True)
+    fig.update_layout(
+        legend_title=primary_cat_feature,
+        font=dict(family="Open Sans", size=12),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        width=graph_width if graph_width else max(800, 300 * n_cols),
+        height=graph_height if graph_height else max(600, 350 * n_rows),
+        margin=dict(l=40, r=40, t=80, b=40),
+    )
+    return compact_figure(fig)
+
+
+def run_stages(filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+               stacked_100_percent, graph_width, graph_height, log_y_axis, facet=None,
+               quantile_mode=quantile_sketch.QUANTILE_MODE, on_stage=None):
+    """Run the stages in pipeline order and return the figure.
+
+    ``on_stage(done, total, name)`` is called after each stage, which lets a
+    background callback report progress. Memoization makes this cost the same
+    as calling ``figure`` directly. The dual-metric mode runs the per-metric
+    stages once for each metric; a ``facet`` splits every stage from
+    ``group_statistics`` on by it, and ``quantile_mode`` (see
+    ``quantile_sketch``) picks how those stages compute medians and quartiles.
+
+    Background jobs start without the stage results of earlier jobs, so the
+    run resumes at the last stage whose results another process already
+    put in ``shared_cache``: re-rendering a selection with another
+    aggregation, stacking or axis type does not scan the rows again.
+    """
+    metrics = METRICS if numerical_feature == data_access.DUAL_METRIC else (numerical_feature,)
+    stage_args = {
+        "filter_mask": [(filters,)],
+        "project_totals": [(filters, metric, secondary_cat_feature) for metric in metrics],
+        "contributions": [
+            (filters, metric, secondary_cat_feature, primary_cat_feature) for metric in metrics
+        ] if primary_cat_feature else [],
+        "group_statistics": [
+            (filters, metric, secondary_cat_feature, primary_cat_feature, facet, quantile_mode)
+            for metric in metrics],
+        "group_reduction": [
+            (filters, metric, secondary_cat_feature, primary_cat_feature, aggregation, facet, quantile_mode)
+            for metric in metrics],
+        "normalization": [
+            (filters, metric, secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent, facet,
+             quantile_mode)
+            for metric in metrics],
+        "category_bucketing": [
+            (filters, metric, secondary_cat_feature, primary_cat_feature, aggregation, stacked_100_percent, facet,
+             quantile_mode, metrics if len(metrics) > 1 else None)
+            for metric in metrics],
+        "figure": [(
+            filters, numerical_feature, secondary_cat_feature, primary_cat_feature, aggregation,
+            stacked_100_percent, graph_width, graph_height, log_y_axis, facet, quantile_mode)],
+    }
+
+    first = 0
+    # ✅ An uncached() run computes every stage
+    resumable = () if _bypass_caches.get() else range(len(STAGE_ORDER) - 1, 0, -1)
+    for index in resumable:
+        stage, calls = _stage_functions[STAGE_ORDER[index]], stage_args[STAGE_ORDER[index]]
+        if calls and all(stage.in_shared_cache(*args) for args in calls):
+            first = index
+            break
+
+    result = None
+    for done, name in enumerate(STAGE_ORDER, start=1):
+        if done > first:
+            result = [_stage_functions[name](*args) for args in stage_args[name]]
+        if on_stage:
+            on_stage(done, len(STAGE_ORDER), name)
+    return result[0]
@@ -0,0 +1,160 @@
+"""Rollup tree of the material hierarchy behind the breakdown page.
+
+``build_tree`` reduces the base view once into one node per path of
+``data_access.MATERIAL_HIERARCHY`` (e.g. material type / material group),
+holding the per-project sums of every metric and their share of the
+project's total. The unfiltered tree is built at load; answering a query
+(``rollup``) then only selects the columns of the peer projects and reduces
+over them, so building level filters never touch the raw rows. Filters on
+material level columns change which rows feed the nodes, so those trees are
+built from the filtered rows and memoized.
+"""
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from dashboard import data_access, material_pipeline
+from dashboard.figure_serialization import compact_figure
+from dashboard.material_pipeline import METRICS, memoized_stage
+
+# ``sums`` and ``shares`` are (metric, node, project) arrays, in ``METRICS`` and
+# ``nodes`` order; ``project_rows`` counts the selected rows of every project
+RollupTree = namedtuple("RollupTree", ["nodes", "sums", "shares", "project_rows"])
+
+PATH_SEPARATOR = " / "
+
+
+def build_tree(mask):
+    """Reduce the selected rows of the base view into a ``RollupTree``."""
+    layout = data_access.get_project_layout()
+    n_projects = len(layout.projects)
+    project_codes = layout.codes[mask]
+    values = np.stack([material_pipeline.metric_values(mask, metric) for metric in METRICS])
+
+    project_totals = np.stack([np.bincount(project_codes, weights=row, minlength=n_projects) for row in values])
+    node_frames, node_sums = [], []
+    path_keys = np.zeros(len(project_codes), dtype='int64')
+    valid = np.ones(len(project_codes), dtype=bool)
+    level_labels = []
+
+    for depth, column in enumerate(col for col in data_access.MATERIAL_HIERARCHY
+                                   if col in data_access.get_scope_df().columns):
+        codes, labels = data_access.get_column_codes(column)
+        codes = codes[mask]
+        level_labels.append((codes, labels))
+        # ✅ A row missing a level still counts for its ancestors
+        valid &= codes >= 0
+        path_keys = path_keys * (len(labels) + 1) + codes + 1
+
+        node_keys, first_rows, inverse = np.unique(path_keys[valid], return_index=True, return_inverse=True)
+        rows = np.flatnonzero(valid)[first_rows]
+        pair_keys = inverse.astype('int64') * n_projects + project_codes[valid]
+        node_sums.append(np.stack([
+            np.bincount(pair_keys, weights=row[valid], minlength=len(node_keys) * n_projects)
+            .reshape(len(node_keys), n_projects)
+            for row in values
+        ], axis=0))
+
+        paths = [labels.take(level_codes[rows]).astype(str) for level_codes, labels in level_labels]
+        ids = [PATH_SEPARATOR.join(parts) for parts in zip(*paths)]
+        parents = [PATH_SEPARATOR.join(parts) for parts in zip(*paths[:-1])] if depth else [""] * len(ids)
+        node_frames.append(pd.DataFrame({"id": ids, "parent": parents, "label": paths[-1], "depth": depth}))
+
+    nodes = pd.concat(node_frames, ignore_index=True)
+    sums = np.concatenate(node_sums, axis=1) if node_sums else np.zeros((len(METRICS), 0, n_projects))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = sums / project_totals[:, None, :]
+    return RollupTree(nodes, sums, shares, np.bincount(project_codes, minlength=n_projects))
+
+
+@data_access.load_once
+def get_base_tree():
+    """Tree of the whole base view, built once at load."""
+    return build_tree(np.ones(len(data_access.get_project_layout().codes), dtype=bool))
+
+
+@memoized_stage("material_tree")
+def filtered_tree(material_filters):
+    return build_tree(material_pipeline.filter_mask(material_filters))
+
+
+def project_mask(building_filters):
+    """Projects whose building level features match the filters."""
+    layout = data_access.get_project_layout()
+    # ✅ Building features are constant within a project: test the first row of each
+    first_rows = layout.offsets[:-1]
+    mask = np.ones(len(layout.projects), dtype=bool)
+    for feature, values in building_filters:
+        mask &= material_pipeline.code_selection(feature, values)[first_rows]
+    return mask
+
+
+@memoized_stage("tree_rollup", shared=True)
+def rollup(filters, numerical_feature):
+    """Per-node statistics of ``numerical_feature`` over the peer projects.
+
+    ``filters`` are normalized filters (see ``material_pipeline.normalize_filters``)
+    on building or material level columns. Returns the tree nodes with
+    ``mean`` (average per-project value, which adds up over children),
+    ``total``, ``median`` and ``mean_share`` (of the project total) over the
+    projects containing the node, and ``projects``, their count.
+    """
+    building_columns = data_access.get_building_columns()
+    building_filters = tuple(item for item in filters if item[0] in building_columns)
+    material_filters = tuple(item for item in filters if item[0] not in building_columns)
+    tree = filtered_tree(material_filters) if material_filters else get_base_tree()
+
+    peers = project_mask(building_filters) & (tree.project_rows > 0)
+    metric = METRICS.index(numerical_feature)
+    sums = tree.sums[metric][:, peers]
+    shares = tree.shares[metric][:, peers]
+    contains = sums != 0
+
+    with warnings.catch_warnings():
+        # ✅ Nodes absent from every peer project have no median or share
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(np.where(contains, sums, np.nan), axis=1)
+        mean_share = np.nanmean(np.where(contains, shares, np.nan), axis=1)
+
+    return tree.nodes.assign(
+        mean=sums.sum(axis=1) / max(int(peers.sum()), 1),
+        total=sums.sum(axis=1),
+        median=median,
+        mean_share=mean_share,
+        projects=contains.sum(axis=1),
+    )
+
+
+def figure(filters, numerical_feature, chart_type, graph_width=None, graph_height=None):
+    """Treemap or sunburst of the rollup; drilling down happens in the browser."""
+    nodes = rollup(filters, numerical_feature)
+    # ✅ Sizes must be non-negative: show each node's own remainder, clipped at zero
+    size = nodes["mean"].clip(lower=0)
+    children = size.groupby(nodes["parent"]).sum()
+    remainder = (size - nodes["id"].map(children).fillna(0)).clip(lower=0)
+
+    trace_type = go.Sunburst if chart_type == "sunburst" else go.Treemap
+    fig = go.Figure(trace_type(
+        ids=nodes["id"],
+        labels=nodes["label"],
+        parents=nodes["parent"],
+        values=remainder,
+        branchvalues="remainder",
+        customdata=nodes[["mean", "median", "mean_share", "projects"]],
+        hovertemplate=(
+            "%{id}<br>Mean per project=%{customdata[0]:.4g}<br>Median=%{customdata[1]:.4g}"
+            "<br>Share of project total=%{customdata[2]:.1%}<br>Projects=%{customdata[3]}<extra></extra>"
+        ),
+    ))
+    fig.update_layout(
+        title=f"Breakdown of {numerical_feature} by {' / '.join(data_access.MATERIAL_HIERARCHY)}",
+        font=dict(family="Open Sans", size=12),
+        paper_bgcolor="white",
+        width=graph_width if graph_width else 800,
+        height=graph_height if graph_height else 700,
+        margin=dict(l=20, r=20, t=60, b=20),
+    )
+    return compact_figure(fig)
@@ -0,0 +1,186 @@
+from dash import html, register_page, dcc
+import dash_bootstrap_components as dbc
+
+from dashboard import data_access, quantile_sketch
+
+register_page(__name__, path='/building_analysis', name='Building Level Analysis', order=2)
+
+
+def layout(**kwargs):
+    categorical_options = data_access.get_building_categorical_options()
+
+    return html.Div([
+
+        # Parent container for layout
+        html.Div([
+            # Left side (Dropdowns & Inputs) - 1/4 width
+            html.Div([
+                # Filtering Area
+                html.Div([
+                    html.Div("Add Filters (Optional):", style={"marginBottom": "5px"}),
+                    dcc.Dropdown(
+                        id="filter-categorical-features",
+                        options=categorical_options,
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        multi=True,
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div(id="filter-values-container", children=[]),
+
+                html.Hr(),
+
+                # Dropdowns for categorical, numerical, and stacking variables
+                html.Div([
+                    html.Label("Select Categories:"),
+                    dcc.Dropdown(
+                        id="categorical-variable",
+                        options=categorical_options,
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        style={'width': '100%'}
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    html.Label("Select Metrics:"),
+                    dcc.Dropdown(
+                        id="numerical-variable",
+                        options=data_access.get_building_numerical_options(),
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        style={'width': '100%'}
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    html.Label("Select Stacks (Optional):"),
+                    dcc.Dropdown(
+                        id="stacking-variable",
+                        options=categorical_options,
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        style={'width': '100%'}
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    html.Label("Split Into Small Multiples By (Optional):"),
+                    dcc.Dropdown(
+                        id="facet-variable",
+                        options=categorical_options,
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        style={'width': '100%'}
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Hr(),
+
+                # Aggregation Method, Error Bars, and Orientation
+                html.Div([
+                    html.Label("Aggregation Method:"),
+                    dcc.RadioItems(
+                        id="aggregation-method",
+                        options=[
+                            {"label": " Sum", "value": "sum"},
+                            {"label": " Mean", "value": "mean"},
+                            {"label": " Median", "value": "median"},
+                            {"label": " Count", "value": "count"},
+                        ],
+                        value="sum",
+                        inline=False,
+                        persistence=True,
+                        persistence_type="session",
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    html.Label("Medians and Quartiles:"),
+                    dcc.RadioItems(
+                        id="quantile-mode",
+                        options=[
+                            {"label": " Exact", "value": "exact"},
+                            {"label": " Approximate (faster)", "value": "approximate"},
+                        ],
+                        value=quantile_sketch.QUANTILE_MODE,
+                        inline=False,
+                        persistence=True,
+                        persistence_type="session",
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    dbc.Checkbox(  # ✅ FIX: Using dbc.Checkbox instead of dcc.Checkbox
+                        id="show-error-bars",
+                        label="Show Error Bars (quartiles)",
+                        value=False,
+                        persistence=True,
+                        persistence_type="session",
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    html.Label("Orientation:"),
+                    dcc.RadioItems(
+                        id="graph-orientation",
+                        options=[
+                            {"label": " Vertical", "value": "v"},
+                            {"label": " Horizontal", "value": "h"},
+                        ],
+                        value="v",
+                        inline=False,
+                        persistence=True,
+                        persistence_type="session",
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Hr(),
+
+                html.Div([
+                    html.Label("Graph Dimensions:", style={'margin-bottom': '5px'}),
+
+                    html.Div([
+                        html.Div([
+                            html.Label("W:", style={'margin-right': '5px'}),
+                            dcc.Input(
+                                id='graph-width',
+                                type='number',
+                                placeholder="e.g., 800",
+                                step=50,
+                                persistence=True,
+                                persistence_type="session",
+                                style={'width': '80px'}
+                            ),
+                        ], style={'display': 'flex', 'align-items': 'center', 'margin-right': '10px'}),
+
+                        html.Div([
+                            html.Label("H:", style={'margin-right': '5px'}),
+                            dcc.Input(
+                                id='graph-height',
+                                type='number',
+                                placeholder="e.g., 600",
+                                step=50,
+                                persistence=True,
+                                persistence_type="session",
+                                style={'width': '80px'}
+                            ),
+                        ], style={'display': 'flex', 'align-items': 'center'}),
+                    ], style={'display': 'flex'}),
+                ], style={'margin-bottom': '10px'}),
+
+            ], style={'width': '25%', 'padding': '10px', 'display': 'inline-block', 'verticalAlign': 'top'}),  # Left section (1/4 width)
+
+            # Right side (Graph) - 3/4 width
+            html.Div([
+                dcc.Graph(id="bar-chart")
+            ], style={'width': '70%', 'display': 'flex', 'justifyContent': 'center', 'alignItems': 'center', 'verticalAlign': 'top', 'padding-left': '10px' }),  # Right section (3/4 width)
+
+        ], style={'display': 'flex', 'justify-content': 'space-between'}),  # Flex container to align sections horizontally
+    ])
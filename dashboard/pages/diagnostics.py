@@ -0,0 +1,66 @@
+from dash import html, register_page, dash_table
+
+from dashboard import admin, data_access, diagnostics
+
+# ✅ admin=True keeps the page out of the navigation bar
+register_page(__name__, path='/admin/diagnostics', name='Diagnostics', order=90, admin=True)
+
+TABLE_STYLE = dict(
+    style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Open Sans', 'fontSize': '13px'},
+    style_header={'backgroundColor': 'light-grey', 'fontWeight': 'bold'},
+    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
+    sort_action='native',
+)
+
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+def records_table(records):
+    columns = list(records[0]) if records else []
+    return dash_table.DataTable(
+        columns=[{"name": col, "id": col} for col in columns],
+        data=records,
+        **TABLE_STYLE
+    )
+
+
+def dataset_section(name, profile):
+    profile = profile.assign(
+        memory=profile['memory_bytes'].map(format_bytes),
+        null_ratio=profile['null_ratio'].round(4),
+    )
+    return html.Div([
+        html.H4(f"{name} ({format_bytes(int(profile['memory_bytes'].sum()))})"),
+        records_table(profile[['column', 'dtype', 'memory', 'memory_bytes', 'cardinality', 'null_ratio']]
+                      .to_dict('records')),
+    ], style={'margin-bottom': '20px'})
+
+
+def layout(token=None, **kwargs):
+    if not admin.is_admin(token):
+        return html.Div("Page not found.", style={'padding': '20px'})
+
+    load_timings = [
+        {"phase": phase, "seconds": round(seconds, 4)}
+        for phase, seconds in data_access.get_load_timings().items()
+    ]
+    caches = [{**row, "bytes": format_bytes(row["bytes"])} for row in diagnostics.cache_sizes()]
+
+    return html.Div([
+        html.H3("Worker diagnostics"),
+        html.P(f"Resident memory: {format_bytes(diagnostics.process_memory())}"),
+        html.H4("Load phases"),
+        records_table(load_timings),
+        html.H4("Caches", style={'margin-top': '20px'}),
+        records_table(caches),
+        html.H3("Datasets", style={'margin-top': '20px'}),
+        *[dataset_section(name, profile) for name, profile in diagnostics.dataset_profiles().items()],
+    ], style={'padding': '20px 20px 20px 20px', 'margin-top': '20px'})
@@ -1,7 +1,7 @@
 from dash import html, register_page
 
 
-register_page(__name__, path='/')
+register_page(__name__, path='/', name='Instructions', order=0)
 
 layout = html.Div(
     [
@@ -0,0 +1,76 @@
+from dash import html, register_page, dcc
+
+from dashboard import data_access
+
+register_page(__name__, path='/material_breakdown', name='Material Breakdown', order=3)
+
+
+def layout(**kwargs):
+    return html.Div([
+
+        # Parent container for layout
+        html.Div([
+            # Left side (Dropdowns & Inputs) - 1/4 width
+            html.Div([
+                # Filtering Area: building level features select the peer projects
+                html.Div([
+                    html.Div("Add Filters (Optional):", style={"marginBottom": "5px"}),
+                    dcc.Dropdown(
+                        id="filter-categorical-features-breakdown",
+                        options=data_access.get_building_categorical_options(),
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        multi=True,
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div(id="filter-values-container-breakdown", children=[]),
+
+                html.Hr(),
+
+                html.Div([
+                    html.Label("Select Metrics:"),
+                    dcc.Dropdown(
+                        id='numerical-feature-breakdown',
+                        options=[
+                            option for option in data_access.get_material_numerical_options()
+                            if option["value"] in data_access.MATERIAL_METRICS
+                        ],
+                        value=data_access.MATERIAL_METRICS[0],
+                        clearable=False,
+                        persistence=True,
+                        persistence_type="session",
+                        style={'width': '100%'}
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div([
+                    html.Label("Chart Type:"),
+                    dcc.RadioItems(
+                        id="chart-type-breakdown",
+                        options=[
+                            {"label": " Treemap", "value": "treemap"},
+                            {"label": " Sunburst", "value": "sunburst"},
+                        ],
+                        value="treemap",
+                        inline=False,
+                        persistence=True,
+                        persistence_type="session",
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.P(
+                    "Click a material to drill down; click the center (or the path at the top) to go back up. "
+                    "Sizes are the average per-project value of each material.",
+                    style={'fontSize': '12px', 'color': 'gray'}
+                ),
+            ], style={'width': '25%', 'padding': '10px', 'display': 'inline-block', 'verticalAlign': 'top'}),  # Left section (1/4 width)
+
+            # Right side (Graph) - 3/4 width
+            html.Div([
+                dcc.Graph(id="breakdown-chart")
+            ], style={'width': '70%', 'display': 'flex', 'justifyContent': 'center', 'alignItems': 'center', 'verticalAlign': 'top', 'padding-left': '10px'}),  # Right section (3/4 width)
+
+        ], style={'display': 'flex', 'justify-content': 'space-between'}),  # Flex container to align sections horizontally
+    ])
@@ -0,0 +1,89 @@
+from dash import html, register_page, dcc
+
+from dashboard import data_access, peer_ranking, takeoff
+
+register_page(__name__, path='/peer_ranking', name='Benchmark a Design', order=4)
+
+
+def takeoff_section(result, error):
+    """Upload form and, once a takeoff was scored this session, its summary and comparison chart."""
+    children = [
+        html.Iframe(src="/upload/takeoff", style={'width': '100%', 'height': '110px', 'border': 'none'}),
+    ]
+    if error:
+        children.append(html.Div(error, style={'color': '#b00', 'margin-bottom': '10px'}))
+    if result:
+        totals = result["totals"]
+        categories = takeoff.category_columns()
+        children += [
+            html.P(
+                f"Uploaded takeoff: {result['rows']:,} A1-A3 rows, {totals['inv_mass']:,.0f} kg, "
+                f"{totals['gwp']:,.0f} kgCO₂e over {result['bldg_cfa']:,.0f} m² "
+                f"(MUI {totals['mui (kg/m²)']:.1f} kg/m², ECI {totals['eci (kgCO₂e/m²)']:.1f} kgCO₂e/m²)."
+            ),
+            html.Div([
+                dcc.Dropdown(id='takeoff-category', options=categories, value=categories[0] if categories else None,
+                             clearable=False, style={'width': '250px', 'margin-right': '10px'}),
+                dcc.Dropdown(id='takeoff-metric', options=data_access.MATERIAL_METRICS,
+                             value=data_access.MATERIAL_METRICS[0], clearable=False, style={'width': '250px'}),
+            ], style={'display': 'flex'}),
+            dcc.Graph(id='takeoff-chart'),
+        ]
+    return html.Div(children, style={'margin-top': '20px', 'width': '100%'})
+
+
+def layout(takeoff_error=None, **kwargs):
+    # ✅ A takeoff scored this session pre-fills the design metrics
+    result = takeoff.get_session_result()
+    design_metrics = takeoff.design_metrics(result) if result else {}
+
+    return html.Div([
+
+        # Parent container for layout
+        html.Div([
+            # Left side (Inputs) - 1/4 width
+            html.Div([
+                html.Label("Design Metrics:"),
+                *[
+                    html.Div([
+                        html.Div(f"{metric}:", style={"marginBottom": "5px"}),
+                        dcc.Input(
+                            id={"type": "design-metric", "metric": metric},
+                            type='number',
+                            placeholder="e.g., 400",
+                            value=design_metrics.get(metric),
+                            persistence=True,
+                            persistence_type="session",
+                            style={'width': '100%'}
+                        ),
+                    ], style={'marginBottom': '10px'})
+                    for metric in peer_ranking.RANKING_METRICS
+                ],
+
+                html.Hr(),
+
+                # Peer group filters
+                html.Div([
+                    html.Div("Peer Group Filters (Optional):", style={"marginBottom": "5px"}),
+                    dcc.Dropdown(
+                        id="filter-categorical-features-ranking",
+                        options=data_access.get_building_categorical_options(),
+                        placeholder="Select a feature...",
+                        persistence=True,
+                        persistence_type="session",
+                        multi=True,
+                    ),
+                ], style={'marginBottom': '10px'}),
+
+                html.Div(id="filter-values-container-ranking", children=[]),
+            ], style={'width': '25%', 'padding': '10px', 'display': 'inline-block', 'verticalAlign': 'top'}),  # Left section (1/4 width)
+
+            # Right side (Results) - 3/4 width
+            html.Div([
+                html.Div(id="ranking-results", style={'margin-bottom': '10px'}),
+                dcc.Graph(id="ranking-chart"),
+                takeoff_section(result, takeoff_error),
+            ], style={'width': '70%', 'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'verticalAlign': 'top', 'padding-left': '10px'}),  # Right section (3/4 width)
+
+        ], style={'display': 'flex', 'justify-content': 'space-between'}),  # Flex container to align sections horizontally
+    ])
@@ -0,0 +1,104 @@
+from urllib.parse import urlencode
+
+from dash import html, register_page, dash_table
+
+from dashboard import admin, request_profiler
+
+# ✅ admin=True keeps the page out of the navigation bar
+register_page(__name__, path='/admin/profiles', name='Request Profiles', order=91, admin=True)
+
+TABLE_STYLE = dict(
+    style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Open Sans', 'fontSize': '13px'},
+    style_header={'backgroundColor': 'light-grey', 'fontWeight': 'bold'},
+    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
+    sort_action='native',
+)
+
+# Functions listed on a profile's page
+TOP_FUNCTIONS = 40
+
+
+def records_table(records, markdown_columns=()):
+    columns = list(records[0]) if records else []
+    return dash_table.DataTable(
+        columns=[
+            {"name": col, "id": col, **({"presentation": "markdown"} if col in markdown_columns else {})}
+            for col in columns
+        ],
+        data=records,
+        **TABLE_STYLE
+    )
+
+
+def profile_link(token, profile_id=None):
+    query = {"token": token, **({"profile": profile_id} if profile_id else {})}
+    return f"/admin/profiles?{urlencode(query)}"
+
+
+def profile_list(token):
+    profiles = [
+        {
+            "profile": f"[{saved['id']}]({profile_link(token, saved['id'])})",
+            "started": saved["started"],
+            "chart": saved["chart"],
+            "cold": "yes" if saved.get("cold") else "no",
+            "seconds": round(saved["seconds"], 3),
+            "samples": saved["samples"],
+            "selection": str(saved["selection"]),
+        }
+        for saved in request_profiler.list_profiles()
+    ]
+    return html.Div([
+        html.H3("Request profiles"),
+        html.P(
+            "Add ?profile=<admin token> to a chart page URL, or send the admin token in the "
+            f"{request_profiler.PROFILE_HEADER} header, to profile its next chart request. "
+            "Stages already in the caches, and snapshots, take next to no samples: add "
+            f"&{request_profiler.COLD_QUERY_PARAMETER}=1 (or {request_profiler.COLD_HEADER}: 1) "
+            "to compute every stage from scratch."
+        ),
+        records_table(profiles, markdown_columns=("profile",)) if profiles else html.P("No profiles saved yet."),
+    ])
+
+
+def profile_details(token, saved):
+    samples = max(saved["samples"], 1)
+    functions = [
+        {
+            **row,
+            "self %": round(100 * row["self"] / samples, 1),
+            "total %": round(100 * row["total"] / samples, 1),
+        }
+        for row in request_profiler.function_totals(saved["stacks"])[:TOP_FUNCTIONS]
+    ]
+    folded = "\n".join(f"{stack} {count}" for stack, count in saved["stacks"].items())
+    return html.Div([
+        html.A("All profiles", href=profile_link(token)),
+        html.H3(f"Profile {saved['id']}"),
+        html.P(
+            f"{saved['chart'].capitalize()} chart ({'cold' if saved.get('cold') else 'as served'}), "
+            f"started {saved['started']} in process {saved['pid']}: "
+            f"{saved['seconds']:.3f}s, {saved['samples']} samples every {saved['interval_ms']:g} ms."
+        ),
+        html.P(f"Selection: {saved['selection']}"),
+        html.H4(f"Top {TOP_FUNCTIONS} functions (samples)"),
+        records_table(functions),
+        html.Details([
+            html.Summary("Folded stacks (for flamegraph.pl or speedscope)"),
+            html.Pre(folded, style={'fontSize': '11px', 'whiteSpace': 'pre', 'overflowX': 'auto'}),
+        ], style={'margin-top': '20px'}),
+    ])
+
+
+def layout(token=None, profile=None, **kwargs):
+    if not admin.is_admin(token):
+        return html.Div("Page not found.", style={'padding': '20px'})
+
+    saved = request_profiler.load_profile(profile) if profile else None
+    if profile and saved is None:
+        content = html.Div([html.A("All profiles", href=profile_link(token)), html.P("No such profile.")])
+    elif saved is not None:
+        content = profile_details(token, saved)
+    else:
+        content = profile_list(token)
+    return html.Div(content, style={'padding': '20px 20px 20px 20px', 'margin-top': '20px'})
@@ -0,0 +1,140 @@
+"""Percentile ranking of a design against its peer buildings.
+
+Peers are the buildings of ``wblca_meta_data`` matching a set of filters.
+Lookups avoid scanning the table: every categorical column has an inverted
+index (value -> sorted row numbers) built at load, every metric is
+presorted once, and the sorted metric values of a peer group are cached. A
+percentile is then two ``searchsorted`` calls, and scoring many designs
+against one peer group is a single vectorized call::
+
+    from dashboard import peer_ranking
+    peer_ranking.percentile_ranks({"mui_a1_to_a3 (kg/m²)": 420.0}, {"site_country": ["Canada"]})
+    peer_ranking.score_designs(designs_df, {"bldg_prim_use_recat": ["Office"]})
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from dashboard import data_access
+from dashboard.figure_serialization import compact_figure
+
+# Building level intensities a design is usually compared on
+RANKING_METRICS = [data_access.META_DATA_RENAMES['mui_a1_to_a3'], data_access.META_DATA_RENAMES['eci_a1_to_a3']]
+
+
+@data_access.load_once
+def get_inverted_index():
+    """``{column: {value: row numbers}}`` for every categorical building column."""
+    meta_data = data_access.get_wblca_meta_data()
+    index = {}
+    for option in data_access.get_building_categorical_options():
+        column = option["value"]
+        codes, values = pd.factorize(meta_data[column])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        index[column] = {
+            value: data_access.freeze(order[bounds[i]:bounds[i + 1]]) for i, value in enumerate(values)
+        }
+    return index
+
+
+@lru_cache(maxsize=None)
+def sorted_metric(metric):
+    """``(values, rows)``: the non-missing values of ``metric`` in ascending order and their rows."""
+    values = data_access.get_wblca_meta_data()[metric].to_numpy(dtype="float64")
+    rows = np.flatnonzero(~np.isnan(values))
+    rows = rows[np.argsort(values[rows], kind="stable")]
+    return data_access.freeze(values[rows]), data_access.freeze(rows)
+
+
+def normalize_peer_filters(filters):
+    """Accept ``{column: values}`` or ``(column, values)`` pairs; return a hashable key."""
+    items = filters.items() if isinstance(filters, dict) else (filters or ())
+    return tuple(sorted((column, tuple(values)) for column, values in items if values))
+
+
+def peer_mask(filters):
+    """Boolean mask of the buildings matching normalized ``filters``."""
+    index = get_inverted_index()
+    mask = np.ones(len(data_access.get_wblca_meta_data()), dtype=bool)
+    for column, values in filters:
+        postings = index[column]
+        selected = np.zeros(len(mask), dtype=bool)
+        for value in values:
+            if value in postings:
+                selected[postings[value]] = True
+        mask &= selected
+    return mask
+
+
+@lru_cache(maxsize=256)
+def peer_values(filters, metric):
+    """Sorted ``metric`` values of the peer group; already sorted, so no sort per group."""
+    values, rows = sorted_metric(metric)
+    return data_access.freeze(values[peer_mask(filters)[rows]])
+
+
+def percentile(values, metric, filters=()):
+    """Percentile (0-100) of each of ``values`` among the peers' ``metric``.
+
+    Ties count half, so a design equal to every peer ranks at 50. Returns
+    ``(percentiles, peer_count)``; percentiles are NaN without peers.
+    """
+    peers = peer_values(normalize_peer_filters(filters), metric)
+    values = np.asarray(values, dtype="float64")
+    if not len(peers):
+        return np.full(values.shape, np.nan), 0
+    below = np.searchsorted(peers, values, side="left")
+    not_above = np.searchsorted(peers, values, side="right")
+    return 100.0 * (below + not_above) / (2 * len(peers)), len(peers)
+
+
+def percentile_ranks(metrics, filters=()):
+    """Rank one design: ``{metric: value}`` -> ``{metric: {"percentile", "peers"}}``."""
+    ranks = {}
+    for metric, value in metrics.items():
+        if value is None:
+            continue
+        scores, peers = percentile([value], metric, filters)
+        ranks[metric] = {"percentile": float(scores[0]), "peers": peers}
+    return ranks
+
+
+def ordinal(number):
+    """``number`` rounded to an English ordinal: 1st, 2nd, 3rd, 4th, ..., 11th, 12th, 13th, 21st."""
+    number = int(round(number))
+    suffix = "th" if number % 100 in (11, 12, 13) else {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+def score_designs(designs, filters=(), metrics=None):
+    """Percentile of every design (row) of a DataFrame, one column per metric."""
+    metrics = metrics or [metric for metric in RANKING_METRICS if metric in designs.columns]
+    return pd.DataFrame(
+        {f"{metric} percentile": percentile(designs[metric].to_numpy(), metric, filters)[0] for metric in metrics},
+        index=designs.index,
+    )
+
+
+def figure(metrics, filters=()):
+    """Peer distribution of each metric with the design marked on it."""
+    filters = normalize_peer_filters(filters)
+    fig = make_subplots(rows=1, cols=len(RANKING_METRICS), subplot_titles=RANKING_METRICS)
+    for col, metric in enumerate(RANKING_METRICS, start=1):
+        fig.add_trace(go.Histogram(x=peer_values(filters, metric), name=metric, marker=dict(color='lightgray'),
+                                   showlegend=False), row=1, col=col)
+        if metrics.get(metric) is not None:
+            fig.add_vline(x=metrics[metric], line_color="blue", line_width=2, row=1, col=col)
+    fig.update_layout(
+        font=dict(family="Open Sans", size=12),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        width=900,
+        height=400,
+        margin=dict(l=40, r=40, t=60, b=40),
+        bargap=0.05,
+    )
+    return compact_figure(fig)
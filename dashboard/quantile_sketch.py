@@ -0,0 +1,132 @@
+"""Mergeable quantile sketches for approximate medians and quartiles.
+
+A sketch counts values in logarithmically spaced buckets, as DDSketch
+does: with ``gamma = (1 + a) / (1 - a)``, bucket ``i`` holds the magnitudes
+in ``(gamma**(i - 1), gamma**i]`` and reports them as
+``2 * gamma**i / (gamma + 1)``, which is within a relative error ``a``
+(``QUANTILE_ACCURACY``) of every value in it. Negative values use mirrored
+buckets and zeros a bucket of their own, so bucket keys sort like the
+values.
+
+Sketches of disjoint sets of values merge by adding their bucket counts.
+Building one is a ``log`` and a ``bincount`` over the values, instead of
+a sort per group, and a value's bucket key can be computed once and merged
+into any selection later.
+
+The median and quartile aggregations of the charts are ``"exact"`` or
+``"approximate"``, picked per request (the ``quantile_mode`` of the chart
+functions, the page controls and the API). ``QUANTILE_MODE``
+(``WBLCA_QUANTILE_MODE``) is the mode of requests that do not pick one,
+``"exact"`` by default.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+QUANTILE_MODES = ("exact", "approximate")
+QUANTILE_MODE = os.environ.get("WBLCA_QUANTILE_MODE", "exact")
+QUANTILE_ACCURACY = float(os.environ.get("WBLCA_QUANTILE_ACCURACY", "0.01"))
+
+# Magnitudes below this count as zero; larger ones than MAX_MAGNITUDE share the last bucket
+MIN_MAGNITUDE = 1e-9
+MAX_MAGNITUDE = 1e15
+
+# Bucket key of missing values, which no sketch counts
+MISSING_KEY = np.iinfo(np.int64).min
+
+# ``counts[g, j]`` is the number of values of group g in bucket ``first_key + j``
+GroupSketches = namedtuple("GroupSketches", ["first_key", "counts", "accuracy"])
+
+
+def approximate(mode=QUANTILE_MODE):
+    """Whether median and quartile aggregations in quantile ``mode`` use sketches."""
+    return mode == "approximate"
+
+
+def _log_gamma(accuracy):
+    return np.log((1 + accuracy) / (1 - accuracy))
+
+
+def _key_offset(accuracy):
+    # ✅ Shifts the bucket indexes so every non-zero magnitude has a key >= 1
+    return 1 - int(np.floor(np.log(MIN_MAGNITUDE) / _log_gamma(accuracy)))
+
+
+def bucket_keys(values, accuracy=QUANTILE_ACCURACY):
+    """Signed bucket key of every value: 0 for zero, ``MISSING_KEY`` for NaN."""
+    values = np.asarray(values, dtype="float64")
+    magnitudes = np.clip(np.nan_to_num(np.abs(values), nan=1.0), MIN_MAGNITUDE, MAX_MAGNITUDE)
+    indexes = np.ceil(np.log(magnitudes) / _log_gamma(accuracy)).astype(np.int64) + _key_offset(accuracy)
+
+    keys = np.where(values < 0, -indexes, indexes)
+    keys[np.abs(values) < MIN_MAGNITUDE] = 0
+    keys[np.isnan(values)] = MISSING_KEY
+    return keys
+
+
+def key_values(keys, accuracy=QUANTILE_ACCURACY):
+    """Value every bucket key stands for (inverse of ``bucket_keys`` up to the accuracy)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    gamma = (1 + accuracy) / (1 - accuracy)
+    magnitudes = 2 * gamma ** (np.abs(keys) - _key_offset(accuracy)).astype("float64") / (gamma + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * magnitudes)
+
+
+def group_sketches(keys, group_codes, n_groups, accuracy=QUANTILE_ACCURACY):
+    """One sketch per group from bucket keys and group codes (0 .. n_groups - 1).
+
+    Values with a ``MISSING_KEY`` key or a negative group code are left out.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    counted = (keys != MISSING_KEY) & (group_codes >= 0)
+    keys, group_codes = keys[counted], group_codes[counted]
+    if not len(keys):
+        return GroupSketches(0, np.zeros((n_groups, 1), dtype=np.int64), accuracy)
+
+    # ✅ Dense over the key range present: a bincount instead of a sort
+    first_key = int(keys.min())
+    width = int(keys.max()) - first_key + 1
+    counts = np.bincount(group_codes * width + (keys - first_key), minlength=n_groups * width)
+    return GroupSketches(first_key, counts.reshape(n_groups, width), accuracy)
+
+
+def quantiles(sketches, qs):
+    """Array of shape ``(groups, len(qs))``; NaN for groups without values.
+
+    Interpolates between the two nearest order statistics like pandas'
+    default ``quantile``, each read back from its bucket.
+    """
+    cumulative = sketches.counts.cumsum(axis=1)
+    totals = cumulative[:, -1]
+    last_bucket = cumulative.shape[1] - 1
+
+    result = np.full((len(totals), len(qs)), np.nan)
+    for column, q in enumerate(qs):
+        rank = q * (totals - 1)
+        lower, upper = np.floor(rank), np.ceil(rank)
+        # ✅ Bucket holding order statistic r: the number of buckets whose cumulative count is <= r
+        lower_values = key_values(
+            sketches.first_key + np.minimum((cumulative <= lower[:, None]).sum(axis=1), last_bucket),
+            sketches.accuracy,
+        )
+        upper_values = key_values(
+            sketches.first_key + np.minimum((cumulative <= upper[:, None]).sum(axis=1), last_bucket),
+            sketches.accuracy,
+        )
+        result[:, column] = np.where(
+            totals > 0, lower_values + (rank - lower) * (upper_values - lower_values), np.nan
+        )
+    return result
+
+
+def grouped_quantiles(values, group_codes, n_groups, qs, accuracy=QUANTILE_ACCURACY):
+    """Approximate quantiles of ``values`` per group, see ``quantiles``."""
+    return quantiles(group_sketches(bucket_keys(values, accuracy), group_codes, n_groups, accuracy), qs)
+
+
+def ngroup_codes(grouped):
+    """Group code of every row of a pandas groupby, -1 for rows in no group."""
+    codes = grouped.ngroup().to_numpy(dtype="float64")
+    return np.where(np.isnan(codes), -1, codes).astype(np.int64)
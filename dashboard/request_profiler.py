@@ -0,0 +1,238 @@
+"""On-demand sampling profiles of slow chart requests.
+
+An admin can ask for one chart request to be profiled, without a
+redeploy, by passing the admin token (see ``admin``) either
+
+- as the ``X-Profile-Token`` header of the callback request, or
+- as the ``profile`` query parameter of the page, e.g.
+  ``/material_analysis?profile=...``, which reaches the callbacks in the
+  ``Referer`` header.
+
+``process_data`` and ``update_bar_chart`` then run the chart under a
+sampling profiler: a thread reads the callback thread's Python stack every
+``SAMPLE_INTERVAL_SECONDS``. The sampled stacks, the selection key and the
+timing are saved as one JSON file in ``WBLCA_PROFILE_DIR`` (the newest
+``MAX_PROFILES`` are kept) and browsed on the ``/admin/profiles`` page.
+Stacks are stored in the "folded" format of flamegraph.pl and speedscope.
+
+Background callbacks run in a job process; the headers travel with the job,
+so those requests are profiled in the process that does the work. A
+profiled request always gets a job of its own (see ``cache_token``): it
+never joins a running job or reuses a finished result of the same
+selection, which would leave nothing to profile.
+
+By default the chart is profiled as served, so stages already in the
+stage caches, and snapshots, take next to no samples. Add
+``profile_cold=1`` to the page URL, or send ``X-Profile-Cold: 1``, to
+compute every stage from scratch instead (``material_pipeline.uncached``).
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlsplit
+
+import dash
+
+from dashboard import admin, data_access, material_pipeline
+
+PROFILE_DIR = os.environ.get("WBLCA_PROFILE_DIR", os.path.join(data_access.CACHE_ROOT, "profiles"))
+MAX_PROFILES = int(os.environ.get("WBLCA_PROFILE_KEEP", "50"))
+SAMPLE_INTERVAL_SECONDS = float(os.environ.get("WBLCA_PROFILE_INTERVAL_MS", "5")) / 1000
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_QUERY_PARAMETER = "profile"
+COLD_HEADER = "X-Profile-Cold"
+COLD_QUERY_PARAMETER = "profile_cold"
+
+# Profile ids are generated here; anything else is not a profile file name
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}-[0-9]{6}-[a-z]+-[0-9a-f]{8}$")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+
+def _request_value(header, query_parameter):
+    """``header`` of the current callback request, else ``query_parameter`` of its page URL."""
+    try:
+        headers = {name.lower(): value for name, value in (dash.ctx.headers or {}).items()}
+    except dash.exceptions.MissingCallbackContextException:
+        return None
+    if headers.get(header.lower()):
+        return headers[header.lower()]
+    page_query = parse_qs(urlsplit(headers.get("referer", "")).query)
+    return next(iter(page_query.get(query_parameter, [])), None)
+
+
+def requested():
+    """Whether the current callback request asks for a profile with a valid admin token."""
+    return admin.is_admin(_request_value(PROFILE_HEADER, PROFILE_QUERY_PARAMETER))
+
+
+def cold_requested():
+    """Whether a profiled request asks for every stage to be computed from scratch."""
+    return (_request_value(COLD_HEADER, COLD_QUERY_PARAMETER) or "").lower() in ("1", "true", "yes")
+
+
+def cache_token():
+    """Background callback cache key part: unique for every profiled request, empty otherwise."""
+    return uuid.uuid4().hex if requested() else ""
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(REPO_DIR):
+        filename = os.path.relpath(filename, REPO_DIR)
+    else:
+        # ✅ Library frames: the last two path parts are enough to tell them apart
+        filename = "/".join(filename.replace(os.sep, "/").split("/")[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    """Counts the folded Python stacks of one thread, sampled at a fixed interval."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _save(profile):
+    path = os.path.join(data_access.private_dir(PROFILE_DIR), f"{profile['id']}.json")
+    # ✅ Written under a temporary name first: the admin page never reads a partial profile
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as json_file:
+        json.dump(profile, json_file, default=str)
+    os.replace(tmp_path, path)
+
+    for stale in _profile_files()[MAX_PROFILES:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+
+@contextmanager
+def profile(chart, selection):
+    """Profile the enclosed code when the request asks for it, saving it under ``selection``.
+
+    Yields whether this is a cold profile: the caller then skips the
+    snapshots too, and the stages run without their caches.
+    """
+    if not requested():
+        yield False
+        return
+
+    cold = cold_requested()
+    sampler = Sampler(threading.get_ident())
+    started, start = time.time(), time.perf_counter()
+    sampler.start()
+    try:
+        if cold:
+            with material_pipeline.uncached():
+                yield True
+        else:
+            yield False
+    finally:
+        sampler.stop()
+        seconds = time.perf_counter() - start
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{chart}-{uuid.uuid4().hex[:8]}"
+        try:
+            _save({
+                "id": profile_id,
+                "chart": chart,
+                "selection": selection,
+                "cold": cold,
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started)),
+                "seconds": seconds,
+                "samples": sum(sampler.stacks.values()),
+                "interval_ms": sampler.interval * 1000,
+                "pid": os.getpid(),
+                "stacks": dict(sampler.stacks.most_common()),
+            })
+            logger.info("Saved profile %s of a %.2fs %s request", profile_id, seconds, chart)
+        except OSError:
+            # ✅ A full or read-only disk must not fail the chart request being profiled
+            logger.warning("Could not save profile %s", profile_id, exc_info=True)
+
+
+def _profile_files():
+    """Profile files, newest first."""
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    profile_ids = [name[:-len(".json")] for name in names if name.endswith(".json")]
+    return sorted(
+        (os.path.join(PROFILE_DIR, f"{profile_id}.json") for profile_id in profile_ids
+         if PROFILE_ID_PATTERN.match(profile_id)),
+        reverse=True,
+    )
+
+
+def list_profiles():
+    """Summary of every saved profile (without its stacks), newest first."""
+    summaries = []
+    for path in _profile_files():
+        try:
+            with open(path, encoding="utf-8") as json_file:
+                saved = json.load(json_file)
+        except (OSError, ValueError):
+            continue
+        saved.pop("stacks", None)
+        summaries.append(saved)
+    return summaries
+
+
+def load_profile(profile_id):
+    """The saved profile ``profile_id``, or ``None`` when there is no such profile."""
+    if not profile_id or not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def function_totals(stacks):
+    """``[{function, self, total}]`` sample counts, by self samples.
+
+    ``self`` counts the samples with the function on top of the stack,
+    ``total`` those with the function anywhere on it (once per sample, so
+    recursion is not counted twice).
+    """
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        labels = stack.split(";")
+        self_counts[labels[-1]] += count
+        for label in set(labels):
+            total_counts[label] += count
+    return [
+        {"function": label, "self": self_counts[label], "total": total}
+        for label, total in sorted(total_counts.items(), key=lambda item: (-self_counts[item[0]], -item[1]))
+    ]
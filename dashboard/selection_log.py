@@ -0,0 +1,52 @@
+"""Popularity counts of the chart selections users request.
+
+``process_data`` and ``update_bar_chart`` record the normalized argument
+tuple of every chart they build. Counts live in a small diskcache shared by
+all workers and kept across restarts, so the cache warm-up after a deploy
+knows which charts are requested most.
+"""
+import heapq
+import logging
+import os
+
+import diskcache
+
+from dashboard import data_access
+
+SELECTION_LOG_DIR = os.environ.get(
+    "WBLCA_SELECTION_LOG_DIR", os.path.join(data_access.CACHE_ROOT, "selections")
+)
+SELECTION_LOG_SIZE_LIMIT = 16 * 2 ** 20
+
+logger = logging.getLogger(__name__)
+
+_log = None
+
+
+def _selection_log():
+    global _log
+    if _log is None:
+        # ✅ Short timeout: a busy log must never hold up a callback
+        # ✅ Private directory: the selection keys are stored pickled
+        _log = diskcache.Cache(
+            data_access.private_dir(SELECTION_LOG_DIR),
+            timeout=1,
+            size_limit=SELECTION_LOG_SIZE_LIMIT,
+            eviction_policy="least-recently-stored",
+        )
+    return _log
+
+
+def record(chart, key):
+    """Count one request of ``key`` (a hashable argument tuple) for ``chart``."""
+    try:
+        _selection_log().incr((chart, key))
+    except (diskcache.Timeout, OSError):
+        logger.warning("Could not record %s selection", chart, exc_info=True)
+
+
+def most_popular(n):
+    """The ``n`` most requested ``(chart, key)`` pairs, most popular first."""
+    log = _selection_log()
+    counts = ((log.get(entry, 0), entry) for entry in log.iterkeys())
+    return [entry for _, entry in heapq.nlargest(n, counts, key=lambda item: item[0])]
@@ -0,0 +1,149 @@
+"""Result cache shared by every worker process on the machine.
+
+Stage memoization (``material_pipeline.memoized_stage``) is per process: each
+gunicorn worker, and each background job process forked from one, computes
+and keeps its own copy, and whatever a background job computes is lost
+when it exits. Stages declared with ``shared=True`` are additionally kept
+here, in a diskcache directory (``WBLCA_SHARED_CACHE_DIR``) all of them
+open, so a result computed by any process is reused by the others. The
+directory is private to the app's user (``data_access.private_dir``):
+results are stored pickled.
+
+- Keys are namespaced by the dataset version and the ``WBLCA_*`` settings,
+  so results of other data files or settings are never served.
+- The store is bounded to ``WBLCA_SHARED_CACHE_MB`` and evicts the least
+  recently used results beyond that.
+- Only one process computes a given key at a time: the others wait for its
+  result (at most ``COMPUTE_TIMEOUT_SECONDS``) instead of computing it too.
+
+Any object with diskcache's ``get``/``set``/``add``/``delete`` methods and
+``in`` test can stand in for the store, see ``set_store``.
+"""
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+import diskcache
+
+from dashboard import data_access
+
+SHARED_CACHE_DIR = os.environ.get("WBLCA_SHARED_CACHE_DIR", os.path.join(data_access.CACHE_ROOT, "shared"))
+SHARED_CACHE_BYTES = int(os.environ.get("WBLCA_SHARED_CACHE_MB", "512")) * 2 ** 20
+
+# Longest a process waits for another process computing the same key
+COMPUTE_TIMEOUT_SECONDS = 30.0
+POLL_SECONDS = 0.05
+
+# Hash of the WBLCA_* settings, which can change what a stage returns
+SETTINGS_VERSION = hashlib.sha256(
+    repr(sorted((name, value) for name, value in os.environ.items() if name.startswith("WBLCA_"))).encode("utf-8")
+).hexdigest()[:12]
+
+_MISSING = object()
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_store():
+    """The shared store, opened once per process (forked processes open their own)."""
+    global _store, _store_pid
+    with _store_lock:
+        # ✅ SQLite connections must not be carried across fork into background jobs
+        if _store is None or _store_pid != os.getpid():
+            _store = diskcache.Cache(
+                data_access.private_dir(SHARED_CACHE_DIR), size_limit=SHARED_CACHE_BYTES, eviction_policy="least-recently-used"
+            )
+            _store_pid = os.getpid()
+        return _store
+
+
+def set_store(store):
+    """Use ``store`` instead of the diskcache directory, e.g. a local key-value server client."""
+    global _store, _store_pid
+    with _store_lock:
+        _store, _store_pid = store, os.getpid()
+
+
+def cache_key(name, args):
+    args_hash = hashlib.sha256(repr(args).encode("utf-8")).hexdigest()
+    return f"{name}:{data_access.get_dataset_version()}:{SETTINGS_VERSION}:{args_hash}"
+
+
+def contains(name, args):
+    """Whether the result for ``(name, args)`` is in the store, without loading it."""
+    return cache_key(name, args) in get_store()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        stats = _stats.setdefault(name, {"hits": 0, "misses": 0, "waits": 0})
+        stats[outcome] += 1
+
+
+def get_stats():
+    """Per-name hits, misses (computed here) and waits (computed by another process)."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def get_or_compute(name, args, compute):
+    """Value of ``compute()`` for ``(name, args)``, computed by at most one process at a time."""
+    store = get_store()
+    key = cache_key(name, args)
+    value = store.get(key, default=_MISSING)
+    if value is not _MISSING:
+        _count(name, "hits")
+        return value
+
+    computing_key = f"{key}:computing"
+    # ✅ ``add`` is atomic: exactly one process claims the key and computes it
+    if store.add(computing_key, os.getpid(), expire=COMPUTE_TIMEOUT_SECONDS):
+        try:
+            value = compute()
+            store.set(key, value)
+        finally:
+            store.delete(computing_key)
+        _count(name, "misses")
+        return value
+
+    deadline = time.monotonic() + COMPUTE_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        value = store.get(key, default=_MISSING)
+        if value is not _MISSING:
+            _count(name, "waits")
+            return value
+        # ✅ A cancelled background job never finishes its key: compute it here instead
+        computing_pid = store.get(computing_key)
+        if computing_pid is None or not _process_alive(computing_pid):
+            break
+    _count(name, "misses")
+    return compute()
+
+
+def memoize(name):
+    """Decorator keeping the results of ``func(*args)`` in the shared store."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            return get_or_compute(name, args, lambda: func(*args))
+        return wrapper
+    return decorator
+
@@ -0,0 +1,124 @@
+"""Prerendered snapshots of the standard, unfiltered chart views.
+
+``build()`` (run by ``tools/build_snapshots.py``) renders the canonical
+material and building level charts into ``SNAPSHOT_DIR``: one figure JSON
+and one CSV of the plotted (aggregated) values per view, plus a
+``manifest.json`` naming the selection behind every file. The callbacks
+call ``lookup()`` first and only compute charts live when no snapshot
+matches the selection or the snapshots were built from other data files.
+"""
+import csv
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+from dashboard import building_chart, data_access, material_pipeline, selection_log
+from dashboard.figure_serialization import decode_array
+
+SNAPSHOT_DIR = os.environ.get("WBLCA_SNAPSHOT_DIR", os.path.join(data_access.BASE_DIR, "snapshots"))
+MANIFEST_NAME = "manifest.json"
+
+MATERIAL_AGGREGATIONS = ("mean", "median")
+# The building page opens with "sum" selected
+BUILDING_AGGREGATIONS = ("sum",)
+
+
+def snapshot_id(chart, key):
+    """Stable file name stem of a selection; ``key`` is the builder's argument tuple."""
+    return hashlib.sha1(json.dumps([chart, key], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def canonical_views():
+    """``(chart, key)`` of every standard view: one category and metric, no filters or stacking."""
+    for option in data_access.get_categorical_options():
+        for metric in data_access.get_material_numerical_options():
+            for aggregation in MATERIAL_AGGREGATIONS:
+                # Same argument order as ``process_data`` passes to ``run_stages``
+                yield "material", ((), metric["value"], option["value"], None, aggregation,
+                                   False, None, None, False)
+
+    for option in data_access.get_building_categorical_options():
+        for metric in data_access.get_building_numerical_options():
+            for aggregation in BUILDING_AGGREGATIONS:
+                # Same argument order as ``update_bar_chart`` passes to ``building_chart.figure``
+                yield "building", (option["value"], metric["value"], aggregation, None, None, "v",
+                                   (), None, False)
+
+
+def _write_csv(path, figure):
+    """Write the plotted values of every trace as ``series, x, y`` rows."""
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["series", "x", "y"])
+        for trace in figure.get("data", []):
+            x, y = decode_array(trace.get("x", [])), decode_array(trace.get("y", []))
+            for x_value, y_value in zip(np.asarray(x).tolist(), np.asarray(y).tolist()):
+                writer.writerow([trace.get("name", ""), x_value, y_value])
+
+
+def build(directory=SNAPSHOT_DIR, popular=0):
+    """Render the canonical views (and the ``popular`` most requested ones) into ``directory``."""
+    builders = {"material": material_pipeline.run_stages, "building": building_chart.figure}
+    os.makedirs(directory, exist_ok=True)
+
+    views = list(canonical_views())
+    if popular:
+        views += [(chart, key) for chart, key in selection_log.most_popular(popular) if chart in builders]
+
+    entries = {}
+    for chart, key in views:
+        view_id = snapshot_id(chart, key)
+        if view_id in entries:
+            continue
+        figure = builders[chart](*key)
+        with open(os.path.join(directory, f"{view_id}.json"), "w", encoding="utf-8") as json_file:
+            json_file.write(to_json_plotly(figure))
+        _write_csv(os.path.join(directory, f"{view_id}.csv"), figure)
+        entries[view_id] = {"chart": chart, "key": key, "figure": f"{view_id}.json", "csv": f"{view_id}.csv"}
+
+    manifest = {
+        "dataset_version": data_access.get_dataset_version(),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "views": entries,
+    }
+    # ✅ Write the manifest last (and atomically): a half-built directory is never served
+    tmp_path = os.path.join(directory, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+    return manifest
+
+
+@data_access.load_once
+def get_manifest():
+    """Manifest of ``SNAPSHOT_DIR``, or ``None`` if missing or built from other data."""
+    path = os.path.join(SNAPSHOT_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get("dataset_version") != data_access.get_dataset_version():
+        return None
+    return manifest
+
+
+@lru_cache(maxsize=256)
+def _load_figure(filename):
+    with open(os.path.join(SNAPSHOT_DIR, filename), encoding="utf-8") as json_file:
+        return json.load(json_file)
+
+
+def lookup(chart, key):
+    """Prerendered figure dict for a selection, or ``None`` to compute it live."""
+    manifest = get_manifest()
+    if manifest is None:
+        return None
+    entry = manifest["views"].get(snapshot_id(chart, key))
+    if entry is None or entry["chart"] != chart:
+        return None
+    return _load_figure(entry["figure"])
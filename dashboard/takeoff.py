@@ -0,0 +1,194 @@
+"""Upload and scoring of a project's own material takeoff.
+
+A takeoff has the schema of the material results CSV (``inv_mass``, ``gwp``
+and the material category columns). ``POST /upload/takeoff`` streams the
+file to disk (werkzeug spools uploads above 500 KB) and parses it in
+chunks of ``CHUNK_ROWS`` rows, reading only the needed columns, so memory
+stays bounded whatever the file size. Each chunk goes through
+``data_access.add_derived_metrics``, the same code as the benchmark data,
+and is reduced to running per-category sums right away.
+
+The scored result is small. It is kept in a diskcache shared by all
+workers for ``RESULT_EXPIRE_SECONDS`` and tied to the browser session by a
+cookie.
+"""
+import os
+import uuid
+from urllib.parse import urlencode
+
+import diskcache
+import flask
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from dashboard import data_access, material_pipeline
+from dashboard.figure_serialization import compact_figure
+
+MAX_TAKEOFF_BYTES = int(os.environ.get("WBLCA_MAX_TAKEOFF_MB", 200)) * 2 ** 20
+CHUNK_ROWS = 100_000
+RESULT_EXPIRE_SECONDS = 24 * 3600
+TAKEOFF_CACHE_DIR = os.environ.get("WBLCA_TAKEOFF_CACHE_DIR", os.path.join(data_access.CACHE_ROOT, "takeoffs"))
+SESSION_COOKIE = "wblca_takeoff"
+RETURN_PATH = "/peer_ranking"
+
+uploads = flask.Blueprint("takeoff", __name__, url_prefix="/upload")
+
+_results = None
+
+
+class TakeoffError(ValueError):
+    pass
+
+
+def _result_cache():
+    global _results
+    if _results is None:
+        _results = diskcache.Cache(data_access.private_dir(TAKEOFF_CACHE_DIR), size_limit=256 * 2 ** 20)
+    return _results
+
+
+def category_columns():
+    """Material category columns of the results file a takeoff can be broken down by."""
+    results_columns = data_access.get_results_columns()
+    return [option["value"] for option in data_access.get_categorical_options()
+            if option["value"] in results_columns and option["value"] not in ("project_index", "life_cycle_stage")]
+
+
+def score_takeoff(csv_file, bldg_cfa):
+    """Stream a takeoff CSV and return its metric totals and per-category sums."""
+    if not bldg_cfa or bldg_cfa <= 0:
+        raise TakeoffError("The conditioned floor area must be a positive number.")
+
+    categories = category_columns()
+    wanted = set(categories) | {"inv_mass", "gwp", "life_cycle_stage"}
+    metrics = data_access.MATERIAL_METRICS
+    totals = pd.Series(0.0, index=["inv_mass", "gwp", *metrics])
+    category_sums = {}
+    rows = 0
+
+    scope_stage = data_access.SCOPES[data_access.BASE_SCOPE]["life_cycle_stage"]
+    try:
+        chunks = pd.read_csv(csv_file, chunksize=CHUNK_ROWS, usecols=lambda col: col in wanted,
+                             na_values=data_access.NA_VALUES)
+        for chunk in chunks:
+            missing = {"inv_mass", "gwp"} - set(chunk.columns)
+            if missing:
+                raise TakeoffError(f"Missing required column(s): {', '.join(sorted(missing))}")
+
+            for col in ("inv_mass", "gwp"):
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+            # ✅ Same scope as the benchmark: cradle to gate only
+            if "life_cycle_stage" in chunk.columns:
+                chunk = chunk[chunk["life_cycle_stage"] == scope_stage]
+            chunk = data_access.add_derived_metrics(chunk.assign(bldg_cfa=float(bldg_cfa)))
+
+            rows += len(chunk)
+            totals += chunk[totals.index].sum()
+            for category in categories:
+                if category in chunk.columns:
+                    sums = chunk.groupby(category)[metrics].sum()
+                    previous = category_sums.get(category)
+                    category_sums[category] = sums if previous is None else previous.add(sums, fill_value=0)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as error:
+        raise TakeoffError(f"Could not read the file as CSV: {error}") from error
+
+    if not rows:
+        raise TakeoffError("The file has no A1-A3 rows.")
+    return {
+        "bldg_cfa": float(bldg_cfa),
+        "rows": rows,
+        "totals": totals.to_dict(),
+        "categories": {category: sums.reset_index() for category, sums in category_sums.items()},
+    }
+
+
+def benchmark_comparison(result, category, metric):
+    """The takeoff's per-category values next to the benchmark median per project."""
+    project_sums = material_pipeline.category_sums((), category)
+    # ✅ Median over the projects that use the category at all
+    benchmark = project_sums[project_sums[metric] != 0].groupby(category)[metric].median().rename("benchmark_median")
+    takeoff = result["categories"][category].set_index(category)[metric].rename("takeoff")
+    return pd.concat([takeoff, benchmark], axis=1).reset_index().rename(columns={"index": category})
+
+
+def design_metrics(result):
+    """Building level metrics of a scored takeoff, keyed like ``peer_ranking.RANKING_METRICS``."""
+    return {
+        data_access.META_DATA_RENAMES['mui_a1_to_a3']: result["totals"]['mui (kg/m²)'],
+        data_access.META_DATA_RENAMES['eci_a1_to_a3']: result["totals"]['eci (kgCO₂e/m²)'],
+    }
+
+
+def comparison_figure(result, category, metric):
+    """Grouped bars of the takeoff against the benchmark median, per category."""
+    comparison = benchmark_comparison(result, category, metric)
+    fig = go.Figure([
+        go.Bar(x=comparison[category], y=comparison["takeoff"], name="Your project", marker=dict(color="blue")),
+        go.Bar(x=comparison[category], y=comparison["benchmark_median"], name="Benchmark median",
+               marker=dict(color="lightgray")),
+    ])
+    fig.update_layout(
+        title=f"{metric} by {category}: your project and the benchmark",
+        barmode="group",
+        font=dict(family="Open Sans", size=12),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        width=900,
+        height=450,
+        margin=dict(l=40, r=40, t=60, b=40),
+        yaxis=dict(showgrid=True, gridcolor="lightgray", gridwidth=0.5),
+    )
+    return compact_figure(fig)
+
+
+def get_session_result():
+    """Scored takeoff of the current browser session, if any."""
+    takeoff_id = flask.request.cookies.get(SESSION_COOKIE)
+    if not takeoff_id:
+        return None
+    return _result_cache().get(takeoff_id)
+
+
+UPLOAD_FORM = """<!doctype html>
+<html><body style="font-family: 'Open Sans', sans-serif; font-size: 13px; margin: 0">
+<form action="/upload/takeoff" method="post" enctype="multipart/form-data" target="_top">
+  <div style="margin-bottom: 5px">Material takeoff (CSV, same columns as the results file, up to {max_mb} MB):</div>
+  <input type="file" name="file" accept=".csv,text/csv" required>
+  <div style="margin: 5px 0">Conditioned floor area (m²): <input type="number" name="bldg_cfa" min="0" step="any" required
+    style="width: 100px"></div>
+  <button type="submit">Upload and score</button>
+</form>
+</body></html>"""
+
+
+@uploads.route("/takeoff", methods=["GET"])
+def upload_form():
+    return UPLOAD_FORM.format(max_mb=MAX_TAKEOFF_BYTES // 2 ** 20)
+
+
+def _return_with_error(message):
+    return flask.redirect(f"{RETURN_PATH}?{urlencode({'takeoff_error': message})}", code=303)
+
+
+@uploads.route("/takeoff", methods=["POST"])
+def upload_takeoff():
+    # ✅ Refuse oversized uploads before reading them
+    flask.request.max_content_length = MAX_TAKEOFF_BYTES
+    try:
+        upload = flask.request.files.get("file")
+        if upload is None:
+            raise TakeoffError("Choose a CSV file to upload.")
+        bldg_cfa = pd.to_numeric(flask.request.form.get("bldg_cfa"), errors="coerce")
+        result = score_takeoff(upload.stream, None if np.isnan(bldg_cfa) else bldg_cfa)
+    except RequestEntityTooLarge:
+        return _return_with_error(f"The file is larger than {MAX_TAKEOFF_BYTES // 2 ** 20} MB.")
+    except TakeoffError as error:
+        return _return_with_error(str(error))
+
+    takeoff_id = uuid.uuid4().hex
+    _result_cache().set(takeoff_id, result, expire=RESULT_EXPIRE_SECONDS)
+    response = flask.redirect(RETURN_PATH, code=303)
+    response.set_cookie(SESSION_COOKIE, takeoff_id, httponly=True, samesite="Lax")
+    return response
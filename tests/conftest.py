@@ -0,0 +1,18 @@
+"""Keep every on-disk cache of the dashboard in a temporary directory during tests."""
+import os
+import tempfile
+
+_CACHE_ROOT = tempfile.mkdtemp(prefix="wblca-dashboard-tests-")
+
+for _name, _directory in {
+    "WBLCA_SHARED_CACHE_DIR": "shared",
+    "WBLCA_JOB_CACHE_DIR": "jobs",
+    "WBLCA_SELECTION_LOG_DIR": "selections",
+    "WBLCA_SNAPSHOT_DIR": "snapshots",
+    "WBLCA_TAKEOFF_CACHE_DIR": "takeoffs",
+    "WBLCA_PARSE_CACHE_DIR": "parsed",
+    "WBLCA_PROFILE_DIR": "profiles",
+}.items():
+    os.environ.setdefault(_name, os.path.join(_CACHE_ROOT, _directory))
+# ✅ No cache warm-up thread racing the tests
+os.environ.setdefault("WBLCA_WARMUP_TOP_N", "0")
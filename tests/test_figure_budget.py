@@ -0,0 +1,44 @@
+"""Small multiples share one trace budget with the chart they split.
+
+Every facet subplot draws one trace per stacked category, so the figure as
+a whole, not each subplot, is held to ``MAX_FIGURE_TRACES``.
+"""
+import warnings
+
+import pytest
+
+from dashboard import data_access, material_pipeline
+
+METRIC = data_access.MATERIAL_METRICS[0]
+
+
+def _cardinality(option):
+    return len(data_access.get_column_codes(option["value"])[1])
+
+
+@pytest.fixture(scope="module")
+def selection():
+    """The most fragmented stacks and grid: the largest material and building level features."""
+    options = data_access.get_categorical_options()
+    building = sorted((o for o in options if material_pipeline.is_building_level(o["value"])), key=_cardinality)
+    material = sorted((o for o in options if not material_pipeline.is_building_level(o["value"])), key=_cardinality)
+    return material[0]["value"], material[-1]["value"], building[-1]["value"]
+
+
+@pytest.mark.parametrize("numerical_feature", [METRIC, data_access.DUAL_METRIC])
+@pytest.mark.parametrize("budget", [material_pipeline.MAX_FIGURE_TRACES, 24])
+def test_facet_grid_stays_within_the_trace_budget(monkeypatch, selection, numerical_feature, budget):
+    secondary, primary, facet = selection
+    monkeypatch.setattr(material_pipeline, "MAX_FIGURE_TRACES", budget)
+
+    # ✅ Uncached: the stage caches hold figures built with the default budget
+    with material_pipeline.uncached(), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fig = material_pipeline.run_stages(
+            (), numerical_feature, secondary, primary, "mean", False, None, None, False, facet
+        )
+        single = material_pipeline.run_stages((), METRIC, secondary, primary, "mean", False, None, None, False)
+
+    assert len(fig["data"]) <= budget
+    assert len(single["data"]) <= budget
+    assert len({trace.get("xaxis", "x") for trace in fig["data"]}) > 1
@@ -0,0 +1,95 @@
+"""The loaded datasets and memoized stage results are shared by every thread of a worker.
+
+Readers get frozen, buffer-sharing frames: writing into the shared buffers
+raises, and the chart callbacks and the API leave the datasets unchanged.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard import app, data_access, material_pipeline
+
+METRIC = data_access.MATERIAL_METRICS[0]
+
+
+def _read_only(frame):
+    return all(
+        not getattr(block.values, "_ndarray", block.values).flags.writeable
+        for block in frame._mgr.blocks
+        if isinstance(getattr(block.values, "_ndarray", block.values), np.ndarray)
+    )
+
+
+@pytest.fixture(scope="module", autouse=True)
+def datasets():
+    """Deep copies of the shared datasets, taken before any callback runs."""
+    return data_access.get_scope_df().copy(deep=True), data_access.get_wblca_meta_data().copy(deep=True)
+
+
+def test_loaded_datasets_are_frozen():
+    for frame in (data_access.get_scope_df(), data_access.get_wblca_meta_data()):
+        assert _read_only(frame)
+        values = frame.select_dtypes("number")._mgr.blocks[0].values
+        with pytest.raises(ValueError, match="read-only"):
+            values[0] = 0
+
+
+def test_writes_to_a_shared_frame_stay_private():
+    frame = data_access.get_scope_df()
+    original = frame[METRIC].copy()
+    frame.loc[frame.index[0], METRIC] = -1.0
+    frame["scratch"] = 1
+
+    fresh = data_access.get_scope_df()
+    assert "scratch" not in fresh.columns
+    pd.testing.assert_series_equal(fresh[METRIC], original)
+
+
+def test_stage_results_are_frozen():
+    mask = material_pipeline.filter_mask(())
+    with pytest.raises(ValueError, match="read-only"):
+        mask[0] = False
+
+    sums, first_rows = material_pipeline.project_sums(())
+    assert _read_only(sums)
+    with pytest.raises(ValueError, match="read-only"):
+        first_rows[0] = 0
+
+
+def test_callbacks_and_api_leave_datasets_unchanged(datasets):
+    scope_df, meta_data = datasets
+    building_feature = data_access.get_building_categorical_options()[0]["value"]
+    building_metric = data_access.get_building_numerical_options()[0]["value"]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for primary, secondary, aggregation, stacked, quantile_mode in [
+            ("mat_type", "mat_group", "mean", False, "exact"),
+            ("mat_type", "bldg_prim_use_recat", "median", True, "exact"),
+            (None, "mat_group", "median", False, "approximate"),
+        ]:
+            app.process_data(
+                lambda progress: None, primary, secondary, METRIC, None, None, False, stacked, aggregation,
+                [], None, None, quantile_mode, [],
+            )
+        for aggregation, stacking, error_bars, quantile_mode in [
+            ("sum", None, False, "exact"),
+            ("median", None, True, "approximate"),
+            ("mean", "site_region", False, "exact"),
+        ]:
+            app.update_bar_chart(
+                building_feature, building_metric, aggregation, None, None, "v", [], stacking, error_bars,
+                None, None, quantile_mode, [],
+            )
+
+        client = app.server.test_client()
+        response = client.get(
+            "/api/v1/material",
+            query_string={"metric": METRIC, "secondary": "mat_group", "primary": "mat_type", "aggregation": "mean"},
+        )
+        assert response.status_code == 200
+
+    pd.testing.assert_frame_equal(data_access.get_scope_df(), scope_df)
+    pd.testing.assert_frame_equal(data_access.get_wblca_meta_data(), meta_data)
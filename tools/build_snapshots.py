@@ -0,0 +1,39 @@
+"""Prerender the standard dashboard views into static snapshot files.
+
+Writes one figure JSON and one CSV per canonical material and building
+level view, plus ``manifest.json``, into the snapshot directory
+(``WBLCA_SNAPSHOT_DIR``, by default ``dashboard/snapshots``). Run it after
+the data files change and before starting the app::
+
+    python tools/build_snapshots.py
+    python tools/build_snapshots.py --popular 50 --output /srv/wblca-snapshots
+
+The app serves these files at ``/snapshots/<name>`` and answers matching
+chart requests from them; snapshots built from other data files are ignored.
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from dashboard import snapshots  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=snapshots.SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--popular", type=int, default=0,
+                        help="also prerender the N most requested selections from the selection log")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = snapshots.build(args.output, popular=args.popular)
+    print(f"Wrote {len(manifest['views'])} views for dataset {manifest['dataset_version']} "
+          f"to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
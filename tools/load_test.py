@@ -0,0 +1,284 @@
+"""Concurrent-session load test for the Dash callback endpoint.
+
+Replays recorded ``_dash-update-component`` requests against a running
+dashboard (or one started here with gunicorn), ramping the number of
+concurrent virtual sessions. For every ramp step it reports throughput,
+p50/p99 latency per callback and the peak memory of each gunicorn worker,
+which is the evidence for the worker/thread counts in the Procfile.
+
+Recorded requests come from ``load_test_payloads.json`` next to this file
+or from a browser HAR export (``--har``)::
+
+    python tools/load_test.py --start --workers 2 --threads 8 --ramp 1,4,16,32
+    python tools/load_test.py --url http://127.0.0.1:8050 --har session.har
+
+Background callbacks are followed to completion, so their latency covers
+the job and the polling, as a user would experience it.
+"""
+import argparse
+import gzip
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import psutil
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_test_payloads.json")
+UPDATE_PATH = "/_dash-update-component"
+POLL_INTERVAL_SECONDS = 0.25
+REQUEST_TIMEOUT_SECONDS = 120
+
+
+def load_payloads(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_har_payloads(path):
+    """Extract the callback requests recorded in a browser HAR export."""
+    with open(path, encoding="utf-8") as f:
+        har = json.load(f)
+
+    payloads = []
+    for entry in har["log"]["entries"]:
+        request = entry["request"]
+        url = urllib.parse.urlparse(request["url"])
+        # ✅ Skip background callback polls; the replay performs its own polling
+        if request["method"] != "POST" or not url.path.endswith(UPDATE_PATH) or "cacheKey" in url.query:
+            continue
+        body = json.loads(request["postData"]["text"])
+        payloads.append({"name": body["output"], "body": body})
+    return payloads
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class VirtualSession(threading.Thread):
+    """One browser session replaying the recorded callbacks until ``deadline``."""
+
+    def __init__(self, base_url, payloads, deadline, results, seed):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip("/")
+        self.payloads = list(payloads)
+        self.deadline = deadline
+        self.results = results
+        self.random = random.Random(seed)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def _post(self, body, query=""):
+        request = urllib.request.Request(
+            self.base_url + UPDATE_PATH + (f"?{query}" if query else ""),
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"},
+            method="POST",
+        )
+        with self.opener.open(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            data = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            return response.status, data
+
+    def replay(self, payload):
+        """Run one callback to completion and return its latency in seconds."""
+        start = time.perf_counter()
+        status, data = self._post(payload["body"])
+        handles = json.loads(data) if status == 200 and data.startswith(b"{") else {}
+
+        # ✅ Background callbacks answer with job handles; poll like the renderer does
+        if "cacheKey" in handles and "job" in handles:
+            query = urllib.parse.urlencode({"cacheKey": handles["cacheKey"], "job": handles["job"]})
+            while True:
+                time.sleep(POLL_INTERVAL_SECONDS)
+                status, data = self._post(payload["body"], query)
+                # ✅ 204 means the job finished without an update (e.g. cancelled)
+                if status == 204 or b'"response"' in data:
+                    break
+                if time.perf_counter() - start > REQUEST_TIMEOUT_SECONDS:
+                    raise TimeoutError(payload["name"])
+        return time.perf_counter() - start
+
+    def run(self):
+        try:
+            self.opener.open(self.base_url + "/", timeout=REQUEST_TIMEOUT_SECONDS).read()
+        except (urllib.error.URLError, OSError):
+            pass
+        while time.monotonic() < self.deadline:
+            payload = self.random.choice(self.payloads)
+            try:
+                latency = self.replay(payload)
+            except (urllib.error.URLError, OSError, TimeoutError, ValueError):
+                self.results.record_error(payload["name"])
+            else:
+                self.results.record(payload["name"], latency)
+
+
+class StepResults:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name, latency):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(latency)
+
+    def record_error(self, name):
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def worker_processes(server_pid):
+    """The gunicorn worker processes (children of the master)."""
+    try:
+        return psutil.Process(server_pid).children(recursive=False)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def sample_memory(server_pid, peak_rss, stop):
+    while not stop.is_set():
+        for proc in worker_processes(server_pid):
+            try:
+                rss = proc.memory_info().rss
+            except psutil.NoSuchProcess:
+                continue
+            peak_rss[proc.pid] = max(peak_rss.get(proc.pid, 0), rss)
+        stop.wait(0.5)
+
+
+def run_step(base_url, payloads, sessions, duration, server_pid):
+    results = StepResults()
+    peak_rss = {}
+    stop = threading.Event()
+    sampler = None
+    if server_pid:
+        sampler = threading.Thread(target=sample_memory, args=(server_pid, peak_rss, stop), daemon=True)
+        sampler.start()
+
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    threads = [VirtualSession(base_url, payloads, deadline, results, seed) for seed in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    if sampler:
+        sampler.join()
+
+    all_latencies = [latency for values in results.latencies.values() for latency in values]
+    return {
+        "sessions": sessions,
+        "requests": len(all_latencies),
+        "errors": sum(results.errors.values()),
+        "throughput_rps": len(all_latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(all_latencies, 50) * 1000,
+        "p99_ms": percentile(all_latencies, 99) * 1000,
+        "callbacks": {
+            name: {
+                "requests": len(results.latencies.get(name, [])),
+                "errors": results.errors.get(name, 0),
+                "p50_ms": percentile(results.latencies.get(name, []), 50) * 1000,
+                "p99_ms": percentile(results.latencies.get(name, []), 99) * 1000,
+            }
+            for name in sorted(set(results.latencies) | set(results.errors))
+        },
+        "worker_peak_rss_mb": {str(pid): rss / 2 ** 20 for pid, rss in sorted(peak_rss.items())},
+    }
+
+
+def start_server(port, workers, threads):
+    """Start ``dashboard.app:server`` under gunicorn and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "dashboard.app:server",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads)],
+        cwd=REPO_DIR,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=5).read()
+            return process, base_url
+        except (urllib.error.URLError, OSError):
+            if process.poll() is not None:
+                raise RuntimeError("gunicorn exited before the server came up")
+            time.sleep(1)
+    process.terminate()
+    raise RuntimeError("Timed out waiting for the server to start")
+
+
+def print_step(step):
+    print(
+        f"{step['sessions']:>8} {step['requests']:>9} {step['errors']:>7} "
+        f"{step['throughput_rps']:>9.1f} {step['p50_ms']:>9.0f} {step['p99_ms']:>9.0f}  "
+        + ", ".join(f"{rss:.0f}" for rss in step["worker_peak_rss_mb"].values())
+    )
+    for name, stats in step["callbacks"].items():
+        print(f"{'':>8} {stats['requests']:>9} {stats['errors']:>7} {'':>9} {stats['p50_ms']:>9.0f} {stats['p99_ms']:>9.0f}  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running dashboard")
+    target.add_argument("--start", action="store_true", help="Start dashboard.app:server with gunicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--server-pid", type=int, help="gunicorn master PID for memory sampling with --url")
+    parser.add_argument("--payloads", default=DEFAULT_PAYLOADS, help="Recorded payloads (JSON)")
+    parser.add_argument("--har", help="Replay the callback requests of a browser HAR export instead")
+    parser.add_argument("--ramp", default="1,2,4,8,16", help="Comma separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per ramp step")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    payloads = load_har_payloads(args.har) if args.har else load_payloads(args.payloads)
+    if not payloads:
+        parser.error("No callback requests to replay")
+
+    process = None
+    base_url, server_pid = args.url, args.server_pid
+    if args.start:
+        process, base_url = start_server(args.port, args.workers, args.threads)
+        server_pid = process.pid
+
+    steps = []
+    try:
+        print(f"{'sessions':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}  worker peak RSS (MB)")
+        for sessions in (int(value) for value in args.ramp.split(",")):
+            step = run_step(base_url, payloads, sessions, args.duration, server_pid)
+            steps.append(step)
+            print_step(step)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(30)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"target": base_url, "workers": args.workers, "threads": args.threads, "steps": steps}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
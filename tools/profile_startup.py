@@ -0,0 +1,78 @@
+"""Profile the cold start of a dashboard worker.
+
+Imports ``dashboard.app`` in a fresh interpreter, as a gunicorn worker
+does at boot, under ``python -X importtime``, and reports the wall time,
+the peak RSS of that process, the data load phases and the slowest
+imports (cumulative, including their own imports)::
+
+    python tools/profile_startup.py
+    python tools/profile_startup.py --top 40 --runs 3
+
+The first run after the data files change also parses the Excel
+workbooks; later runs read them from ``WBLCA_PARSE_CACHE_DIR``. Cache
+warm-up is disabled in the profiled process so it does not add to the RSS.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child process; prints its measurements as one JSON line
+CHILD_SCRIPT = """
+import json, resource, time
+start = time.perf_counter()
+import dashboard.app
+from dashboard import data_access
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "load_phases": data_access.get_load_timings(),
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """``{module: cumulative seconds}`` from ``-X importtime`` output."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports[module.strip()] = int(cumulative) / 1e6
+    return imports
+
+
+def profile_once():
+    env = dict(os.environ, WBLCA_WARMUP_TOP_N="0")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=20, help="number of slowest imports to list")
+    parser.add_argument("--runs", type=int, default=1, help="profile this many cold starts")
+    args = parser.parse_args()
+
+    for run in range(1, args.runs + 1):
+        result = profile_once()
+        print(f"Run {run}: {result['seconds']:.2f}s to import dashboard.app, peak RSS {result['max_rss_mb']:.0f} MB")
+        for phase, seconds in result["load_phases"].items():
+            print(f"  load  {seconds * 1000:8.1f} ms  {phase}")
+
+    slowest = sorted(result["imports"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print("Slowest imports of the last run (cumulative):")
+    for module, seconds in slowest:
+        print(f"  {seconds * 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()